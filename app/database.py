@@ -4,7 +4,8 @@ from sqlalchemy.orm import sessionmaker
 
 # 1. Database Connection
 import os
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "market.db")
+# MARKET_DB_PATH points tools (memory report, load tests) at a fixture or synthetic universe
+DB_PATH = os.environ.get("MARKET_DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "market.db"))
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 engine = create_engine(
@@ -34,6 +35,8 @@ class Instrument(Base):
     StrikePrice = Column(Float, nullable=True)
 
 class BrandTag(Base):
+    __tablename__ = "brand_tags"
+
     id = Column(Integer, primary_key=True, index=True)
     tag = Column(String, index=True)          # e.g., "Maggi"
     symbol = Column(String)                   # e.g., "NESTLEIND"
@@ -1,10 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os
+import hmac
+import time
+import anyio.to_thread
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Header, BackgroundTasks, Response
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 from .database import SessionLocal
-from .services.search_service import search_logic
+from .services.search_service import search_logic, parse_query, resolve_symbol
+from .services.snapshot import get_snapshot
+from .services.search_index import get_search_index, serving_data_version
+from .services.option_chain import get_chain
+from .services.keyset import CursorError
+from .services.expiry_calendar import get_expiry_calendar, start_rollover_scheduler
+from .services import warmup
+from .services.budget import Deadline, AdmissionGate
+from .services.shadow import ShadowMode
+from .services.memory import memory_report
+from .services.profiler import Profiler
+from .services.sql_trace import traced
+from .services.singleflight import SingleFlight, LeaderTimeout, search_key
+from .services.query_log import QueryLog, timed, search_scenario
+
+# Shared secret for /admin/* (sent as X-Admin-Token); unset = admin endpoints disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+# How long clients/CDN may reuse a /search response before revalidating it with If-None-Match
+SEARCH_MAX_AGE = int(os.environ.get("SEARCH_MAX_AGE", "60"))
+# Threads running sync endpoints per worker (0 = anyio's default of 40); scripts/load_test.py sweeps it
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", "0"))
 
 # 1. Initialize the App
-app = FastAPI(title="Smart Trade Search API")
+# Warmup (engine, mappers, snapshot/index load, hot-query replay) runs in the background at boot;
+# /ready only turns green once it is done, so the load balancer never routes to a cold worker.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if THREADPOOL_SIZE:
+        anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    warmup.start_warmup()
+    # Rebuilds the active expiry calendar at every trading-date change
+    stop_rollover = start_rollover_scheduler()
+    query_log.start()
+    yield
+    stop_rollover.set()
+    query_log.stop()
+
+app = FastAPI(title="Smart Trade Search API", lifespan=lifespan)
 
 # 2. Database Dependency (Opens/Closes DB for each request)
 def get_db():
@@ -14,26 +54,268 @@ def get_db():
     finally:
         db.close()
 
+# Admission Control: runs on the event loop before the request takes a threadpool slot.
+# Over capacity -> immediate 503, so queued work (and tail latency) stays bounded under overload.
+search_gate = AdmissionGate()
+
+async def admit_search():
+    if not search_gate.try_enter():
+        raise HTTPException(status_code=503, detail="Search is over capacity, retry shortly", headers={"Retry-After": "1"})
+    try:
+        # The latency budget starts at admission, so threadpool queueing counts against it
+        yield Deadline()
+    finally:
+        search_gate.leave()
+
+# Shadow Mode (opt-in via SHADOW_ENGINE): a sample of /search traffic is replayed through a candidate
+# engine after the response is sent, and diffed against what search_logic served.
+shadow = ShadowMode()
+
+# Profiler (opt-in): a request is profiled when it carries X-Profile: <ADMIN_TOKEN>, or when it is
+# sampled at the rate set through /admin/profiler. Collapsed stacks land in PROFILE_DIR.
+profiler = Profiler()
+
+# Single-flight: identical concurrent searches (same parsed query, cursor, page size) share one
+# search_logic run instead of each hitting the DB, which flattens market-open thundering herds.
+search_flight = SingleFlight()
+
+# Access log: one JSONL entry per /search (query, parsed form, scenario, result count, per-stage ms),
+# handed to a background writer through a bounded queue; entries are dropped rather than waited on.
+query_log = QueryLog()
+
+def admin_token_ok(token: str):
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def require_admin(x_admin_token: str = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not admin_token_ok(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# Conditional requests: a /search URL's answer only changes with the data, so its ETag is the data version.
+# A matching If-None-Match is answered 304 on the event loop, before admission, a DB session or search_logic.
+def cache_headers(etag: str):
+    return {"ETag": etag, "Cache-Control": f"public, max-age={SEARCH_MAX_AGE}"}
+
+def etag_matches(if_none_match: str, etag: str):
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/") for tag in if_none_match.split(","))
+
+async def search_etag(if_none_match: str = Header(None)):
+    etag = f'W/"{serving_data_version()}"'
+    if if_none_match and etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=cache_headers(etag))
+    return etag
+
 # 3. Define the Search Endpoint
 @app.get("/search")
-def search_endpoint(q: str, db: Session = Depends(get_db)):
+def search_endpoint(background_tasks: BackgroundTasks, response: Response, q: str, cursor: str = None,
+                    page_size: int = Query(10, ge=1, le=100), x_profile: str = Header(None),
+                    etag: str = Depends(search_etag),
+                    deadline: Deadline = Depends(admit_search), db: Session = Depends(get_db)):
     """
     Search for instruments using smart logic.
     Example: /search?q=Nifty 27 Jan
+    Next page: /search?q=Nifty 27 Jan&cursor=<next_cursor>
     """
     if not q:
         raise HTTPException(status_code=400, detail="Query string 'q' cannot be empty")
     
+    entry = {"ts": round(time.time(), 3), "query": q, "cursor": cursor, "page_size": page_size}
+    start = time.perf_counter()
     try:
         # Call your existing logic
-        result = search_logic(q, db)
+        entry["parsed"] = parsed = parse_query(q)
+        # Statement count / table-scan warnings (see services/sql_trace.py); stage laps (services/query_log.py)
+        with traced(q) as trace, timed() as timer:
+            if (x_profile and admin_token_ok(x_profile)) or profiler.sampled():
+                result, profile_file = profiler.run(q, search_logic, q, db, deadline, cursor=cursor, page_size=page_size)
+                entry["profiled"] = True
+                if profile_file:
+                    response.headers["X-Profile-File"] = profile_file
+            else:
+                key = search_key(parsed, cursor, page_size)
+                # The leader gets its remaining budget; waiters wait for the leader's, never rerunning the search
+                result, entry["coalesced"] = search_flight.do(key, search_logic, q, db, deadline, cursor=cursor, page_size=page_size,
+                                                              timeout=max(deadline.remaining_ms(), 0) / 1000)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        entry.update({
+            "http_status": 200,
+            "scenario": search_scenario(result),
+            "status": result.get("status"),
+            "results": len(result.get("matches", [])),
+            "degraded": bool(result.get("degraded")),
+            "stages": timer.stages,
+            "sql_ms": round(trace.sql_ms, 3),
+            "sql_statements": trace.count,
+        })
+
+        if result.get("degraded"):
+            # A budget-cut answer must not be reused in place of the full one
+            response.headers["Cache-Control"] = "no-store"
+        else:
+            response.headers.update(cache_headers(etag))
+
+        # Only full-quality first pages are comparable with the candidate's answer
+        if cursor is None and page_size == 10 and not result.get("degraded") and shadow.should_sample():
+            background_tasks.add_task(shadow.run, q, result, elapsed_ms)
         return result
+    except LeaderTimeout as e:
+        # The identical in-flight search blew its budget: overload, answered like admission control
+        entry.update({"http_status": 503, "error": str(e)})
+        raise HTTPException(status_code=503, detail="Search is over capacity, retry shortly", headers={"Retry-After": "1"})
+    except CursorError as e:
+        # Bad or stale cursor
+        entry.update({"http_status": 400, "error": str(e)})
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Log the error internally and return a 500
+        entry.update({"http_status": 500, "error": str(e)})
         print(f"Server Error: {e}") 
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        entry["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        query_log.log(entry)
+
+# 3a. Explain mode: every SQL statement a search issues, with its plan, rows and time
+@app.get("/search/explain", dependencies=[Depends(require_admin)])
+def search_explain(q: str, cursor: str = None, page_size: int = Query(10, ge=1, le=100), use_index: bool = True,
+                   db: Session = Depends(get_db)):
+    """
+    Runs search_logic unbudgeted (no admission, no deadline) and reports the SQL behind the answer.
+    use_index=false shows the SQL F&O path the prebuilt index normally replaces.
+    Example: /search/explain?q=nifty 26k ce&use_index=false
+    """
+    if not q:
+        raise HTTPException(status_code=400, detail="Query string 'q' cannot be empty")
+    try:
+        start = time.perf_counter()
+        with traced(q, explain=True) as trace:
+            result = search_logic(q, db, cursor=cursor, page_size=page_size, use_index=use_index)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "query": q,
+        "parsed": parse_query(q),
+        "elapsed_ms": round(elapsed_ms, 3),
+        **trace.as_dict(),
+        "result": result,
+    }
+
+def resolve_underlying_id(underlying: str, index, db: Session):
+    symbol_text = parse_query(underlying)["raw_symbol"]
+    uid = index.chains.underlyings.get(symbol_text)
+    if uid is None:
+        # Brand aliases, prefixes and typos go through the regular resolver
+        hero, _ = resolve_symbol(symbol_text, db)
+        uid = hero.InstrumentId if hero else None
+    return symbol_text, uid
+
+# 3b. Option Chain Endpoint
+@app.get("/chain")
+def chain_endpoint(underlying: str, expiry: str = None, atm: float = None, window: int = 20, db: Session = Depends(get_db)):
+    """
+    CE/PE pairs aligned by strike for one underlying + expiry, from the prebuilt chain index.
+    Example: /chain?underlying=nifty&expiry=27 jan&atm=25000&window=20
+    expiry defaults to the nearest non-expired one; without atm the whole chain is returned.
+    """
+    index = get_search_index()
+    snap = get_snapshot()
+    if index is None or snap is None:
+        raise HTTPException(status_code=503, detail="Chain index is not loaded yet")
+    if window < 0:
+        raise HTTPException(status_code=400, detail="window must be >= 0")
+
+    symbol_text, uid = resolve_underlying_id(underlying, index, db)
+    if uid is None or uid not in index.chains.chains:
+        raise HTTPException(status_code=404, detail=f"No option chain found for '{underlying}'")
+
+    calendar = get_expiry_calendar()
+    chain = get_chain(snap, index.chains, uid, expiry, atm, window, calendar.trading_date if calendar else None)
+    if chain is None:
+        raise HTTPException(status_code=404, detail=f"No expiry matching '{expiry}' for '{underlying}'")
+
+    row = snap.row_for_id(uid)
+    return {
+        "status": "success",
+        "underlying": snap.string("Symbol", row) if row is not None else symbol_text,
+        "atm_strike": atm,
+        **chain
+    }
+
+@app.get("/expiries")
+def expiries_endpoint(underlying: str, db: Session = Depends(get_db)):
+    """
+    Upcoming weekly and monthly expiries of one underlying, nearest first, for the current trading date.
+    Example: /expiries?underlying=banknifty
+    """
+    index = get_search_index()
+    calendar = get_expiry_calendar()
+    if index is None or calendar is None:
+        raise HTTPException(status_code=503, detail="Expiry calendar is not loaded yet")
+
+    symbol_text, uid = resolve_underlying_id(underlying, index, db)
+    if uid is None or uid not in index.keyset.blocks:
+        raise HTTPException(status_code=404, detail=f"No derivatives found for '{underlying}'")
+    return {"status": "success", "underlying": symbol_text, **calendar.listing(uid)}
+
+# 3c. Admin: shadow comparison report
+@app.get("/admin/shadow", dependencies=[Depends(require_admin)])
+def shadow_report():
+    return {"enabled": shadow.enabled, **shadow.as_dict()}
+
+# 3d. Admin: memory accounting
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+def memory_endpoint(scenarios: bool = False, repeat: int = Query(3, ge=1, le=20)):
+    """
+    Resident size of each loaded search structure; ?scenarios=true adds per-request tracemalloc
+    profiles per search_logic scenario (traces the whole process while it runs, so expect noise under load).
+    """
+    return memory_report(scenarios=scenarios, repeat=repeat)
+
+# 3e. Admin: request profiler
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)])
+def profiler_status():
+    return profiler.as_dict()
+
+@app.post("/admin/profiler", dependencies=[Depends(require_admin)])
+def profiler_toggle(sample_pct: float = Query(..., ge=0, le=100)):
+    """Profile this percentage of /search requests (0 = off)."""
+    profiler.sample_pct = sample_pct
+    return profiler.as_dict()
+
+@app.get("/admin/profiler/{name}", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+def profiler_file(name: str):
+    path = profiler.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile named '{name}'")
+    with open(path) as f:
+        return f.read()
+
+# 3f. Admin: search coalescing counters
+@app.get("/admin/coalescing", dependencies=[Depends(require_admin)])
+def coalescing_report():
+    return search_flight.as_dict()
+
+# 3g. Admin: query log writer state (analysis: scripts/query_log_report.py)
+@app.get("/admin/query-log", dependencies=[Depends(require_admin)])
+def query_log_report():
+    return query_log.as_dict()
 
 # 4. Root Endpoint (Health Check)
 @app.get("/")
 def root():
-    return {"message": "Smart Trade Search API is running. Go to /search?q=nifty"}
\ No newline at end of file
+    snap = get_snapshot()
+    return {
+        "message": "Smart Trade Search API is running. Go to /search?q=nifty",
+        "data_version": snap.data_version if snap else None
+    }
+
+# 5. Readiness Probe (Load Balancer)
+@app.get("/ready")
+def ready():
+    status = warmup.state.as_dict()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
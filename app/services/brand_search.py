@@ -0,0 +1,140 @@
+import re
+import threading
+from collections import deque
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import OperationalError
+from ..database import BrandTag, Instrument
+
+def normalize_alias(text: str):
+    """Same normalization parse_query applies to raw_symbol, so tags and queries line up."""
+    text = re.sub(r'[^A-Z0-9\s]', '', (text or "").upper())
+    return re.sub(r'\s+', ' ', text).strip()
+
+class BrandMatcher:
+    """
+    Aho-Corasick automaton over BrandTag aliases.
+    Built once from the brand_tags table; finds every alias in a query in a single pass.
+    """
+
+    def __init__(self, entries, listings=None):
+        # entries: iterable of (tag, symbol, tag_type, weight)
+        # listings: {symbol: (InstrumentId, DisplaySymbol, InstrumentType)} captured at build time
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.listings = listings or {}
+        self.size = 0
+
+        for tag, symbol, tag_type, weight in entries:
+            alias = normalize_alias(tag)
+            if not alias or not symbol:
+                continue
+            self._add(alias, (len(alias), symbol.upper(), tag_type, weight if weight is not None else 50))
+            self.size += 1
+
+        self._link()
+
+    def _add(self, alias, payload):
+        node = 0
+        for ch in alias:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(payload)
+
+    def _link(self):
+        # BFS over the trie to fill failure links (classic Aho-Corasick construction)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text: str):
+        """Returns every (alias_len, symbol, tag_type, weight) hit that sits on word boundaries."""
+        if not self.size or not text:
+            return []
+
+        hits = []
+        node = 0
+        n = len(text)
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if not self.out[node]:
+                continue
+            if i + 1 < n and text[i + 1] != ' ':
+                continue
+            for payload in self.out[node]:
+                start = i + 1 - payload[0]
+                if start == 0 or text[start - 1] == ' ':
+                    hits.append(payload)
+        return hits
+
+    def match(self, text: str):
+        """Symbols referenced by the query, strongest alias weight first."""
+        scores = {}
+        for _, symbol, _, weight in self.find(text):
+            if weight > scores.get(symbol, -1):
+                scores[symbol] = weight
+        return sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+
+# --- PROCESS-WIDE MATCHER ---
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def build_brand_matcher(db: Session):
+    try:
+        rows = db.query(BrandTag.tag, BrandTag.symbol, BrandTag.tag_type, BrandTag.weight).all()
+    except OperationalError:
+        # brand_tags has never been seeded on this database
+        db.rollback()
+        return BrandMatcher([])
+
+    symbols = sorted({r[1].upper() for r in rows if r[1]})
+    listings = {}
+    for i in range(0, len(symbols), 500):
+        chunk = symbols[i:i + 500]
+        heroes = db.query(
+            Instrument.InstrumentId, Instrument.Symbol, Instrument.DisplaySymbol, Instrument.InstrumentType
+        ).filter(
+            Instrument.Symbol.in_(chunk),
+            Instrument.InstrumentType.in_([1, 2])
+        ).order_by(Instrument.InstrumentId.asc()).all()
+        # Twin listings (BSE vs NSE) resolve like resolve_exact: an index, else the one with derivatives, else the first
+        parents = {row[0] for row in db.query(Instrument.UnderlyingInstrumentId).filter(
+            Instrument.UnderlyingInstrumentId.in_([h[0] for h in heroes])
+        ).distinct()}
+        twins = {}
+        for inst_id, sym, display, itype in heroes:
+            twins.setdefault(sym, []).append((inst_id, display or sym, itype))
+        for sym, cands in twins.items():
+            listings[sym] = next((c for c in cands if c[2] == 2 or c[0] in parents), cands[0])
+
+    return BrandMatcher(rows, listings)
+
+def get_brand_matcher(db: Session):
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = build_brand_matcher(db)
+    return _matcher
+
+def set_brand_matcher(matcher):
+    """Swaps in a prebuilt matcher (or None to force a rebuild on next use)."""
+    global _matcher
+    with _matcher_lock:
+        _matcher = matcher
@@ -0,0 +1,72 @@
+import os
+import time
+
+# Per-request latency budget for /search, measured from admission
+SEARCH_BUDGET_MS = float(os.environ.get("SEARCH_BUDGET_MS", "250"))
+# Max /search requests admitted at once (queued in the threadpool or running); the rest get a fast 503
+SEARCH_MAX_IN_FLIGHT = int(os.environ.get("SEARCH_MAX_IN_FLIGHT", "32"))
+
+# Budget that must still be left for an optional stage to run (rough p99 cost of the stage)
+STAGE_RESERVE_MS = {
+    "fuzzy": 60,            # thefuzz scan over every equity/index symbol
+    "range_fallback": 40,   # +/-5% strike range query when the exact strike misses
+    "full_fetch": 40,       # up to 50,000 F&O rows; degraded fetch is capped at DEGRADED_FETCH_LIMIT
+    "partials": 15,         # prefix listing under the hero in pure search
+}
+DEGRADED_FETCH_LIMIT = 2000
+
+class Deadline:
+    """Tracks one request's remaining budget and which optional stages were skipped."""
+
+    def __init__(self, budget_ms: float = SEARCH_BUDGET_MS):
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter()
+        self.skipped = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self):
+        return self.budget_ms - self.elapsed_ms()
+
+    def allows(self, stage: str):
+        """True if there is budget left for `stage`; otherwise records it as skipped."""
+        if self.remaining_ms() >= STAGE_RESERVE_MS.get(stage, 0):
+            return True
+        self.skipped.append(stage)
+        return False
+
+    @property
+    def degraded(self):
+        return bool(self.skipped)
+
+def stage_allowed(deadline, stage: str):
+    """search_logic runs unbudgeted (deadline=None) outside the API, e.g. in the test runner."""
+    return deadline is None or deadline.allows(stage)
+
+def mark_degraded(result: dict, deadline):
+    if deadline is not None and deadline.degraded:
+        result["degraded"] = True
+        result["degraded_stages"] = list(deadline.skipped)
+    return result
+
+class AdmissionGate:
+    """
+    Non-blocking in-flight limiter. Only touched from the event loop (async dependency),
+    so a plain counter is enough.
+    """
+
+    def __init__(self, capacity: int = SEARCH_MAX_IN_FLIGHT):
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_enter(self):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def leave(self):
+        self.in_flight -= 1
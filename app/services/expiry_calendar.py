@@ -0,0 +1,196 @@
+import os
+import time
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from .search_index import get_search_index, refresh_data_version
+from .keyset import FAR_EXPIRY
+
+logger = logging.getLogger(__name__)
+
+# Expiries roll over at midnight exchange time (IST), not server time
+TRADING_UTC_OFFSET_MINUTES = int(os.environ.get("TRADING_UTC_OFFSET_MINUTES", "330"))
+# Pin the trading date (YYYY-MM-DD), e.g. to replay an old instrument master; unset = today
+TRADING_DATE = os.environ.get("TRADING_DATE")
+
+MONTH_NAMES = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+def exchange_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=TRADING_UTC_OFFSET_MINUTES)
+
+def trading_date():
+    if TRADING_DATE:
+        return date.fromisoformat(TRADING_DATE)
+    return exchange_now().date()
+
+def seconds_to_rollover():
+    now = exchange_now()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+class ExpiryCalendar:
+    """
+    Active expiries per underlying for one trading date, over the keyset index's expiry blocks.
+    Expired blocks are cut off (the F&O scan, futures listing and SQL fallback never see them), and the
+    blocks for "nearest", a day ("nifty 20"), a month or a day+month are dict lookups.
+    If nothing in the universe is upcoming (stale master / old fixture) nothing is excluded.
+    """
+
+    def __init__(self, keyset, today: date):
+        self.keyset = keyset
+        self.trading_date = today
+        self.cutoff = 0             # ExpiryOrdinal below which contracts are expired (0 = exclude nothing)
+        self.start = {}             # uid -> position of its first active block in keyset.blocks[uid]
+        self.monthly = {}           # uid -> set of expiry ordinals that are the last of their month
+        self.by_day = {}            # uid -> {day: [block positions]}
+        self.by_month = {}          # uid -> {"JAN": [block positions]}
+        self.day_uids = {}          # day -> [uids]   (global search: "27 jan ce")
+        self.month_uids = {}        # "JAN" -> [uids]
+        self.far_uids = set()       # uids with a block of unparseable/missing expiries (matched by LIKE per row)
+        self.expired = []           # ExpiryDate strings ('27-Jan-26') of cut-off expiries, for the SQL fallback's WHERE
+
+    @classmethod
+    def build(cls, keyset, today: date = None):
+        today = today or trading_date()
+        calendar = cls(keyset, today)
+        today_ord = today.toordinal()
+        if any(exp_key >= today_ord and exp_key != FAR_EXPIRY for blocks in keyset.blocks.values() for exp_key, _, _ in blocks):
+            calendar.cutoff = today_ord
+        else:
+            logger.warning("No expiry on or after %s in the instrument master; serving expired contracts", today)
+
+        for uid, blocks in keyset.blocks.items():
+            start = 0
+            while start < len(blocks) and blocks[start][0] < calendar.cutoff:
+                start += 1
+            calendar.start[uid] = start
+            if blocks and blocks[-1][0] == FAR_EXPIRY:
+                calendar.far_uids.add(uid)
+
+            last_of_month = {}
+            by_day, by_month = {}, {}
+            for pos in range(start, len(blocks)):
+                exp_key = blocks[pos][0]
+                if exp_key == FAR_EXPIRY:
+                    continue
+                d = date.fromordinal(exp_key)
+                by_day.setdefault(d.day, []).append(pos)
+                by_month.setdefault(MONTH_NAMES[d.month - 1], []).append(pos)
+            for exp_key, _, _ in blocks:
+                if exp_key != FAR_EXPIRY:
+                    d = date.fromordinal(exp_key)
+                    last_of_month[(d.year, d.month)] = max(exp_key, last_of_month.get((d.year, d.month), 0))
+            calendar.monthly[uid] = set(last_of_month.values())
+            calendar.by_day[uid] = by_day
+            calendar.by_month[uid] = by_month
+            for day in by_day:
+                calendar.day_uids.setdefault(day, []).append(uid)
+            for month in by_month:
+                calendar.month_uids.setdefault(month, []).append(uid)
+
+        for uids in list(calendar.day_uids.values()) + list(calendar.month_uids.values()):
+            uids.sort()
+        expired = {exp_key for blocks in keyset.blocks.values() for exp_key, _, _ in blocks if exp_key < calendar.cutoff}
+        calendar.expired = [date.fromordinal(e).strftime("%d-%b-%y") for e in sorted(expired)]
+        return calendar
+
+    def blocks(self, uid, day=None, month=None):
+        """Active (expiry_key, lo, hi) blocks of `uid`, ascending, narrowed to a day and/or month."""
+        blocks = self.keyset.blocks.get(uid, [])
+        if day is None and month is None:
+            return blocks[self.start.get(uid, 0):]
+        positions = None
+        if day is not None:
+            positions = self.by_day.get(uid, {}).get(day, [])
+        if month is not None:
+            in_month = self.by_month.get(uid, {}).get(month, [])
+            positions = in_month if positions is None else sorted(set(positions) & set(in_month))
+        picked = [blocks[p] for p in positions]
+        # Rows without a parseable expiry keep the per-row LIKE check in the scan
+        if blocks and blocks[-1][0] == FAR_EXPIRY:
+            picked.append(blocks[-1])
+        return picked
+
+    def uids(self, day=None, month=None):
+        """Underlyings that can match a global (no-symbol) expiry query."""
+        if day is None and month is None:
+            return self.keyset.uids
+        candidates = None
+        if day is not None:
+            candidates = set(self.day_uids.get(day, []))
+        if month is not None:
+            in_month = set(self.month_uids.get(month, []))
+            candidates = in_month if candidates is None else candidates & in_month
+        return sorted(candidates | self.far_uids)
+
+    def is_active(self, expiry_ordinal):
+        return not expiry_ordinal or expiry_ordinal >= self.cutoff
+
+    def nearest(self, uid):
+        for exp_key, _, _ in self.blocks(uid):
+            if exp_key != FAR_EXPIRY:
+                return exp_key
+        return None
+
+    def listing(self, uid):
+        """Upcoming expiries in order, split into weekly and monthly."""
+        weekly, monthly = [], []
+        for exp_key, _, _ in self.blocks(uid):
+            if exp_key == FAR_EXPIRY:
+                continue
+            label = date.fromordinal(exp_key).strftime("%d-%b-%y")
+            (monthly if exp_key in self.monthly.get(uid, ()) else weekly).append(label)
+        nearest = self.nearest(uid)
+        return {
+            "trading_date": self.trading_date.isoformat(),
+            "nearest": date.fromordinal(nearest).strftime("%d-%b-%y") if nearest else None,
+            "weekly": weekly,
+            "monthly": monthly,
+        }
+
+# --- PROCESS-WIDE CALENDAR ---
+_calendar = None
+_calendar_lock = threading.Lock()
+
+def get_expiry_calendar():
+    """Calendar for the loaded search index (rebuilt when the index is swapped), or None without one."""
+    global _calendar
+    index = get_search_index()
+    if index is None:
+        return None
+    calendar = _calendar
+    if calendar is None or calendar.keyset is not index.keyset:
+        with _calendar_lock:
+            if _calendar is None or _calendar.keyset is not index.keyset:
+                _calendar = ExpiryCalendar.build(index.keyset)
+            calendar = _calendar
+    return calendar
+
+def rebuild_expiry_calendar():
+    global _calendar
+    index = get_search_index()
+    if index is None:
+        return None
+    calendar = ExpiryCalendar.build(index.keyset)
+    with _calendar_lock:
+        _calendar = calendar
+    # The trading date is part of the /search ETag
+    refresh_data_version()
+    return calendar
+
+def run_rollover_scheduler(stop: threading.Event):
+    while not stop.wait(seconds_to_rollover() + 1):
+        start = time.time()
+        try:
+            calendar = rebuild_expiry_calendar()
+            if calendar is not None:
+                logger.info("Expiry calendar rolled over to %s in %.3fs", calendar.trading_date, time.time() - start)
+        except Exception as e:
+            logger.exception("Expiry calendar rollover failed: %s", e)
+
+def start_rollover_scheduler():
+    """Rebuilds the calendar just after every trading-date change, off the request path."""
+    stop = threading.Event()
+    thread = threading.Thread(target=run_rollover_scheduler, args=(stop,), name="expiry-rollover", daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,250 @@
+import json
+import heapq
+import base64
+import hashlib
+from .snapshot import Snapshot
+
+# parse_date() sorts missing/invalid expiries as datetime.max; ordinal 0 plays that role here
+FAR_EXPIRY = 10 ** 8
+
+def expiry_key(ordinal):
+    return ordinal if ordinal else FAR_EXPIRY
+
+class KeysetIndex:
+    """
+    Where each underlying's derivatives sit in the snapshot's chain order, split per expiry, plus the
+    ranks they carry. Lets F&O search walk matches in (rank, expiry, dist_score, strike, row) order
+    and stop after one page, instead of fetching and sorting the whole match set.
+    """
+
+    def __init__(self):
+        self.blocks = {}   # uid -> [(expiry_key, lo, hi)] ascending; lo/hi are positions in order_chain
+        self.ranks = {}    # uid -> sorted distinct get_instrument_rank() values of its derivatives
+        self.uids = []     # every UnderlyingInstrumentId (-1 = NULL) that has derivatives
+
+    @classmethod
+    def build(cls, snap: Snapshot, ranks):
+        index = cls()
+        itype = snap.columns["InstrumentType"]
+        uid_col = snap.columns["UnderlyingInstrumentId"]
+        exp_col = snap.columns["ExpiryOrdinal"]
+        order = snap.order_chain
+
+        i, n = 0, len(order)
+        while i < n:
+            uid, expiry = uid_col[order[i]], exp_col[order[i]]
+            j = i
+            block_ranks = set()
+            while j < n and uid_col[order[j]] == uid and exp_col[order[j]] == expiry:
+                if itype[order[j]] in (3, 4, 5, 6):
+                    block_ranks.add(ranks[order[j]])
+                j += 1
+            if block_ranks:
+                index.blocks.setdefault(uid, []).append((expiry_key(expiry), i, j))
+                index.ranks.setdefault(uid, set()).update(block_ranks)
+            i = j
+
+        for uid in index.blocks:
+            index.blocks[uid].sort()
+            index.ranks[uid] = sorted(index.ranks[uid])
+        index.uids = sorted(index.blocks)
+        return index
+
+def strike_intervals(parsed: dict, mode="strict"):
+    """
+    Closed StrikePrice intervals a query asks for, in both stored scales (x1, x100), sorted and merged.
+    strict: the strike(s)/range(s) as typed; range: each widened by 5% either side (the fallback).
+    """
+    ranges = parsed["strikes"] or ([[parsed["strike"], parsed["strike"]]] if parsed["strike"] else [])
+    low, high = (0.95, 1.05) if mode == "range" else (1, 1)
+    intervals = []
+    for lo, hi in ranges:
+        for scale in (1, 100):
+            intervals.append(((lo * scale) * low, (hi * scale) * high))
+    intervals.sort()
+
+    merged = []
+    for lo, hi in intervals:
+        if merged and lo <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    return merged
+
+# ==========================================================
+# CURSORS
+# ==========================================================
+def query_fingerprint(parsed: dict, underlying_id):
+    raw = json.dumps([parsed, underlying_id], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:10]
+
+def encode_cursor(mode, key, instrument_id, fingerprint):
+    """Opaque cursor: the last (rank, expiry, dist_score, strike, InstrumentId) served, bound to its query."""
+    rank, exp_key, dist, strike = key[:4]
+    raw = json.dumps([mode, rank, exp_key, dist, strike, instrument_id, fingerprint], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+class CursorError(ValueError):
+    """A cursor that is malformed, belongs to another query, or no longer fits the data (a client error)."""
+
+def decode_cursor(cursor: str, fingerprint):
+    """Returns (mode, (rank, expiry, dist, strike), InstrumentId); CursorError for a malformed/foreign cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        mode, rank, exp_key, dist, strike, instrument_id, fp = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError("Malformed cursor")
+    if fp != fingerprint:
+        raise CursorError("Cursor does not belong to this query")
+    return mode, (rank, exp_key, dist, strike), instrument_id
+
+# ==========================================================
+# ORDERED SCAN
+# ==========================================================
+class KeysetScan:
+    """
+    Same filters and ordering as search_logic's F&O branch, evaluated over the snapshot:
+    one lazily-sorted stream per underlying, k-way merged. Only the groups (underlying, rank, expiry)
+    a page actually reaches are materialized.
+    """
+
+    def __init__(self, snap: Snapshot, search_index, parsed: dict, underlying_id, mode="strict", calendar=None):
+        self.snap = snap
+        self.ranks = search_index.ranks
+        self.keyset = search_index.keyset
+        self.mode = mode
+        # expiry_calendar.ExpiryCalendar: skips expired blocks, finds day/month blocks by lookup
+        self.calendar = calendar
+
+        strike = parsed["strike"]
+        opt_type = parsed["opt_type"]
+        self.target = strike
+
+        # Instrument types + DisplaySymbol LIKE '%CE%', exactly as the SQL filter construction
+        self.opt_like = None
+        if parsed["is_future"]:
+            self.types = (4, 6)
+        elif strike or parsed["strikes"]:
+            self.types = (3, 5)
+        elif parsed["expiry_day"]:
+            self.types = (3, 4, 5, 6)
+        elif opt_type:
+            self.types = (3, 5)
+            self.opt_like = opt_type
+        else:
+            self.types = (4, 6)
+        if (strike or parsed["strikes"]) and opt_type:
+            self.opt_like = opt_type
+
+        self.month = parsed["expiry_month"]
+        self.day = parsed["expiry_day"]
+        self.day_prefix = f"{parsed['expiry_day']:02d}-" if parsed["expiry_day"] else None
+
+        # Strike intervals: each one is a bisected slice of every expiry block's strike-sorted rows
+        self.intervals = strike_intervals(parsed, mode) or None
+
+        if underlying_id is None:
+            self.uids = calendar.uids(self.day, self.month) if calendar else self.keyset.uids
+        else:
+            self.uids = [underlying_id] if underlying_id in self.keyset.blocks else []
+
+    def _expiry_ok(self, expiry_date):
+        # ExpiryDate LIKE '%JAN%' / LIKE '07-%' (LIKE is case-insensitive for ASCII)
+        if self.month and (not expiry_date or self.month not in expiry_date.upper()):
+            return False
+        if self.day_prefix and (not expiry_date or not expiry_date.startswith(self.day_prefix)):
+            return False
+        return True
+
+    def _positions(self, lo, hi):
+        if self.intervals is None:
+            return range(lo, hi)
+        order = self.snap.order_chain
+        strikes = self.snap.columns["StrikePrice"]
+
+        def key(p):
+            # Chain order puts NULL strikes (NaN in the column) first, as -1
+            strike = strikes[order[p]]
+            return strike if strike == strike else -1.0
+
+        positions = []
+        for a, b in self.intervals:
+            start = self._bisect(key, lo, hi, a, False)
+            end = self._bisect(key, start, hi, b, True)
+            positions.extend(range(start, end))
+        return positions
+
+    @staticmethod
+    def _bisect(key, lo, hi, value, upper):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = key(mid)
+            if k < value or (upper and k == value):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _group(self, rank, exp_key, lo, hi):
+        snap = self.snap
+        order = snap.order_chain
+        itype = snap.columns["InstrumentType"]
+        strikes = snap.columns["StrikePrice"]
+        target = self.target
+
+        check_each = exp_key == FAR_EXPIRY
+        if not check_each and (self.month or self.day_prefix):
+            if not self._expiry_ok(snap.string("ExpiryDate", order[lo])):
+                return []
+
+        keys = []
+        for p in self._positions(lo, hi):
+            row = order[p]
+            if itype[row] not in self.types or self.ranks[row] != rank:
+                continue
+            if self.opt_like is not None:
+                display = snap.string("DisplaySymbol", row)
+                if not display or self.opt_like not in display.upper():
+                    continue
+            if check_each and (self.month or self.day_prefix):
+                if not self._expiry_ok(snap.string("ExpiryDate", row)):
+                    continue
+
+            strike = strikes[row]
+            strike_val = strike if strike == strike and strike else 0
+            # calculate_distance()
+            if target is None:
+                dist = 0
+            elif not strike_val:
+                dist = 99999999
+            else:
+                db_strike = strike_val / 100 if strike_val > target * 5 else strike_val
+                dist = abs(db_strike - target)
+            keys.append((rank, exp_key, dist, strike_val, row))
+        keys.sort()
+        return keys
+
+    def _blocks(self, uid):
+        if self.calendar is None:
+            return self.keyset.blocks[uid]
+        return self.calendar.blocks(uid, self.day, self.month)
+
+    def _stream(self, uid, after):
+        blocks = self._blocks(uid)
+        for rank in self.keyset.ranks[uid]:
+            for exp_key, lo, hi in blocks:
+                if after is not None and (rank, exp_key) < after[:2]:
+                    continue
+                for key in self._group(rank, exp_key, lo, hi):
+                    if after is None or key > after:
+                        yield key
+
+    def page(self, after=None, size=10):
+        """Up to `size` keys after `after` (a full key incl. row), and whether more remain."""
+        merged = heapq.merge(*(self._stream(uid, after) for uid in self.uids))
+        keys = []
+        for key in merged:
+            if len(keys) == size:
+                return keys, True
+            keys.append(key)
+        return keys, False
@@ -0,0 +1,199 @@
+import gc
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from array import array
+from sqlalchemy import event
+from ..database import SessionLocal
+from .snapshot import get_snapshot, SNAPSHOT_PATH
+from .search_index import get_search_index
+from .search_service import search_logic
+
+# One representative query set per search_logic scenario (same buckets as shadow.query_category)
+SCENARIO_QUERIES = {
+    "pure": ["nifty", "reliance", "rel", "nifti"],
+    "future": ["nifty fut", "banknifty fut"],
+    "option_type": ["nifty ce", "banknifty pe"],
+    "expiry": ["nifty 27 jan", "banknifty jan"],
+    "strike": ["nifty 26k", "sensex 80000"],
+    "strike+type": ["banknifty 50k pe", "nifty 25000 ce"],
+    "strike_range": ["nifty 24000-25000 ce", "banknifty 50k 51k pe"],
+}
+
+# tracemalloc is process-wide: one scenario profile at a time, or a run finishing first would stop
+# tracing under the other (whose take_snapshot() then raises)
+_profile_lock = threading.Lock()
+
+def deep_sizeof(obj, seen=None):
+    """
+    Bytes reachable from `obj` (containers, arrays, __dict__/__slots__ objects), each object counted once.
+    mmap-backed memoryviews count only their header; the mapping is reported separately.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, memoryview, array)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        else:
+            if hasattr(o, "__dict__"):
+                stack.append(o.__dict__)
+            for slot in getattr(type(o), "__slots__", ()):
+                if hasattr(o, slot):
+                    stack.append(getattr(o, slot))
+    return total
+
+def process_rss():
+    """Current resident set size in bytes (Linux), else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def mapped_rss(path):
+    """Resident bytes of this process' mappings of `path` (shared page cache), from /proc/self/smaps."""
+    path = os.path.realpath(path)
+    total, inside = 0, False
+    try:
+        with open("/proc/self/smaps") as f:
+            for line in f:
+                first = line.split(None, 1)[0]
+                if "-" in first and not first.endswith(":"):
+                    inside = line.rstrip().endswith(path)
+                elif inside and first == "Rss:":
+                    total += int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return total
+
+def structure_sizes():
+    """Resident size of every long-lived search structure in this process."""
+    sizes = {}
+    snap = get_snapshot()
+    if snap is not None:
+        sizes["snapshot_mapped"] = {
+            "rows": len(snap),
+            "file_bytes": os.path.getsize(SNAPSHOT_PATH) if os.path.exists(SNAPSHOT_PATH) else None,
+            # Shared between workers: resident pages are counted once per host, not per process
+            "resident_bytes": mapped_rss(SNAPSHOT_PATH),
+        }
+
+    index = get_search_index()
+    if index is not None:
+        seen = set()
+        for name in ("underlying_symbols", "brand_matcher", "ranks", "chains", "keyset"):
+            sizes[f"index.{name}"] = {"bytes": deep_sizeof(getattr(index, name), seen)}
+
+    return {
+        "process_rss_bytes": process_rss(),
+        "structures": sizes,
+        "private_total_bytes": sum(v.get("bytes", 0) for v in sizes.values()),
+    }
+
+def profile_request(query: str):
+    """
+    Runs one search_logic call under tracemalloc. peak_bytes is the high-water mark above the
+    pre-request baseline; retained_* is what is still alive when the request returns
+    (result dict, ORM leftovers) compared with before it started. orm_objects counts the ORM instances
+    the request materialized (the session's identity map is weak, so it is empty again by the end).
+    """
+    db = SessionLocal()
+    loaded = [0]
+
+    def count_loaded(session, instance):
+        loaded[0] += 1
+
+    event.listen(db, "loaded_as_persistent", count_loaded)
+    try:
+        gc.collect()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        start = time.perf_counter()
+        result = search_logic(query, db)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        current, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    finally:
+        event.remove(db, "loaded_as_persistent", count_loaded)
+        db.close()
+
+    return {
+        "query": query,
+        "ms": round(elapsed_ms, 3),
+        "matches": len(result.get("matches", [])),
+        "peak_bytes": peak - baseline,
+        "retained_bytes": current - baseline,
+        "retained_blocks": sum(d.count_diff for d in diff if d.count_diff > 0),
+        "orm_objects": loaded[0],
+        "top_sites": [
+            {"where": f"{d.traceback[0].filename}:{d.traceback[0].lineno}", "bytes": d.size_diff, "blocks": d.count_diff}
+            for d in sorted(diff, key=lambda d: -d.size_diff)[:3] if d.size_diff > 0
+        ],
+    }
+
+def profile_scenarios(scenarios=None, repeat=3):
+    """Per-scenario allocation profile: mean/max peak and retained bytes over `repeat` traced runs of each query."""
+    scenarios = scenarios or SCENARIO_QUERIES
+    with _profile_lock:
+        return _profile_scenarios(scenarios, repeat)
+
+def _profile_scenarios(scenarios, repeat):
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        report = {}
+        for scenario, queries in scenarios.items():
+            runs = []
+            for query in queries:
+                # Warm call, not recorded: lazily built caches are not per-request cost
+                db = SessionLocal()
+                try:
+                    search_logic(query, db)
+                finally:
+                    db.close()
+                runs.extend(profile_request(query) for _ in range(repeat))
+            report[scenario] = {
+                "queries": queries,
+                "avg_peak_bytes": int(sum(r["peak_bytes"] for r in runs) / len(runs)),
+                "max_peak_bytes": max(r["peak_bytes"] for r in runs),
+                "avg_retained_bytes": int(sum(r["retained_bytes"] for r in runs) / len(runs)),
+                "avg_retained_blocks": int(sum(r["retained_blocks"] for r in runs) / len(runs)),
+                "max_orm_objects": max(r["orm_objects"] for r in runs),
+                "worst": max(runs, key=lambda r: r["peak_bytes"]),
+            }
+        return report
+    finally:
+        if started:
+            tracemalloc.stop()
+
+def memory_report(scenarios=False, repeat=3):
+    report = structure_sizes()
+    if scenarios:
+        report["scenarios"] = profile_scenarios(repeat=repeat)
+    return report
@@ -0,0 +1,162 @@
+from array import array
+from bisect import bisect_left
+from datetime import date
+from .snapshot import Snapshot
+from .search_service import parse_query, parse_date
+
+# OptionType column values
+CALL, PUT = 3, 4
+
+def strike_scale(stored, display_symbol):
+    """100 when StrikePrice is stored x100 (e.g. SENSEX: 7000000 for "SENSEX 30 DEC 70000 CE"), else 1."""
+    parts = (display_symbol or "").split()
+    try:
+        shown = float(parts[-2])
+    except (IndexError, ValueError):
+        return 1
+    return 100 if shown and round(stored / shown) == 100 else 1
+
+class ExpiryChain:
+    """
+    One underlying + expiry: strikes ascending (stored scale), with the CE/PE snapshot row at each strike
+    (-1 = not listed). `scale` converts stored strikes to the quoted ones.
+    """
+    __slots__ = ("expiry", "strikes", "ce", "pe", "scale")
+
+    def __init__(self, expiry, scale=1):
+        self.expiry = expiry
+        self.strikes = array("d")
+        self.ce = array("i")
+        self.pe = array("i")
+        self.scale = scale
+
+    def strike(self, i):
+        return self.strikes[i] / self.scale
+
+    def window(self, atm=None, width=20):
+        """(lo, hi) slice of strike positions: `width` strikes either side of the strike nearest `atm`."""
+        if atm is None or not self.strikes:
+            return 0, len(self.strikes)
+        # `atm` is a quoted strike; the chain is searched in its stored scale
+        target = atm * self.scale
+        pos = bisect_left(self.strikes, target)
+        if pos == len(self.strikes) or (pos > 0 and target - self.strikes[pos - 1] <= self.strikes[pos] - target):
+            pos -= 1
+        return max(0, pos - width), min(len(self.strikes), pos + width + 1)
+
+class ChainIndex:
+    """
+    Per-underlying, per-expiry option chains, built once from the snapshot's (underlying, expiry, strike)
+    order. Holds only snapshot row numbers, so it is valid for exactly one snapshot version.
+    """
+
+    def __init__(self):
+        self.chains = {}        # UnderlyingInstrumentId -> {ExpiryOrdinal: ExpiryChain}
+        self.expiries = {}      # UnderlyingInstrumentId -> [ExpiryOrdinal ascending]
+        self.underlyings = {}   # Symbol -> UnderlyingInstrumentId (only the twin that actually has options)
+        self.labels = {}        # ExpiryOrdinal -> "27-Jan-26"
+
+    @classmethod
+    def build(cls, snap: Snapshot):
+        index = cls()
+        itype = snap.columns["InstrumentType"]
+        uid_col = snap.columns["UnderlyingInstrumentId"]
+        exp_col = snap.columns["ExpiryOrdinal"]
+        strike_col = snap.columns["StrikePrice"]
+        otype = snap.columns["OptionType"]
+
+        current = None
+        for row in snap.order_chain:
+            if itype[row] not in (3, 5):
+                continue
+            strike = strike_col[row]
+            if strike != strike:
+                continue
+            uid, expiry = uid_col[row], exp_col[row]
+
+            if current is None or current[0] != uid or current[1].expiry != expiry:
+                chain = ExpiryChain(expiry, strike_scale(strike, snap.string("DisplaySymbol", row)))
+                index.chains.setdefault(uid, {})[expiry] = chain
+                index.expiries.setdefault(uid, []).append(expiry)
+                if expiry not in index.labels:
+                    index.labels[expiry] = date.fromordinal(expiry).strftime("%d-%b-%y") if expiry else None
+                current = (uid, chain)
+            chain = current[1]
+
+            # Rows arrive sorted by strike, so CE/PE of one strike are adjacent
+            if not chain.strikes or chain.strikes[-1] != strike:
+                chain.strikes.append(strike)
+                chain.ce.append(-1)
+                chain.pe.append(-1)
+            if otype[row] == CALL:
+                chain.ce[-1] = row
+            elif otype[row] == PUT:
+                chain.pe[-1] = row
+
+        for uid in index.chains:
+            row = snap.row_for_id(uid)
+            if row is not None:
+                index.underlyings[snap.string("Symbol", row)] = uid
+        return index
+
+    def pick_expiry(self, uid, expiry_text=None, today=None):
+        """Nearest non-expired expiry by default; otherwise the first one matching '27 JAN' / 'JAN' / '27'."""
+        expiries = self.expiries.get(uid, [])
+        if not expiries:
+            return None
+        today = (today or date.today()).toordinal()
+        upcoming = [e for e in expiries if e >= today] or expiries
+
+        if not expiry_text:
+            return upcoming[0]
+
+        # The instrument master's own format ('27-Jan-26') names one expiry exactly
+        exact = parse_date(expiry_text.strip())
+        if exact.year < 9999:
+            return exact.toordinal() if exact.toordinal() in expiries else None
+
+        # Strict: every token must be a day (1-31) or month. parse_query drops what it cannot use, so
+        # '32 JAN' would otherwise degrade to a month-only match and answer a chain nobody asked for.
+        parsed = parse_query(expiry_text)
+        day, month = parsed["expiry_day"], parsed["expiry_month"]
+        if day is None and month is None:
+            return None
+        if parsed["raw_symbol"] or parsed["strike"] is not None or parsed["strikes"] or parsed["opt_type"] or parsed["is_future"]:
+            return None
+        for e in upcoming + [e for e in expiries if e < today]:
+            d = date.fromordinal(e)
+            if day is not None and d.day != day:
+                continue
+            if month is not None and d.strftime("%b").upper() != month:
+                continue
+            return e
+        return None
+
+def chain_leg(snap: Snapshot, row: int):
+    if row < 0:
+        return None
+    return {
+        "display_name": snap.string("DisplaySymbol", row),
+        "symbol": snap.string("Symbol", row),
+        "instrument_id": snap.columns["InstrumentId"][row],
+    }
+
+def get_chain(snap: Snapshot, chains: ChainIndex, uid: int, expiry=None, atm=None, width=20, today=None):
+    expiry_ord = chains.pick_expiry(uid, expiry, today)
+    if expiry_ord is None:
+        return None
+    chain = chains.chains[uid][expiry_ord]
+    lo, hi = chain.window(atm, width)
+
+    rows = []
+    for i in range(lo, hi):
+        rows.append({
+            "strike": chain.strike(i),
+            "CE": chain_leg(snap, chain.ce[i]),
+            "PE": chain_leg(snap, chain.pe[i]),
+        })
+    return {
+        "expiry": chains.labels[expiry_ord],
+        "expiries": [chains.labels[e] for e in chains.expiries[uid]],
+        "strikes": rows,
+    }
@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter, deque
+from ..database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Collapsed-stack files ("frame;frame;frame count" per line): flamegraph.pl, speedscope, inferno all read them
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(DB_PATH), "profiles"))
+# "trace": every Python/C call via sys.setprofile, weights = self time in µs (exact, ~2-3x slower while on)
+# "sample": stack snapshots every PROFILE_INTERVAL_MS, weights = sample counts (for long requests)
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "trace")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "1"))
+PROFILE_SAMPLE_PCT = float(os.environ.get("PROFILE_SAMPLE_PCT", "0"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "200"))
+
+# sys.setswitchinterval is process-wide: overlapping samplers share one lowered interval, and the
+# original is restored only when the last of them exits
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_original = None
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval_ms` from a helper thread (sys._current_frames),
+    so the profiled code runs unmodified. Overhead is one stack walk per sample, and only while active.
+    """
+
+    def __init__(self, thread_id=None, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __enter__(self):
+        global _switch_users, _switch_original
+        # The sampler needs the GIL to look; a shorter switch interval lets it in at (roughly) its own rate
+        with _switch_lock:
+            if _switch_users == 0:
+                _switch_original = sys.getswitchinterval()
+            _switch_users += 1
+            sys.setswitchinterval(min(sys.getswitchinterval(), self.interval / 2))
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        global _switch_users
+        self._thread.join()
+        with _switch_lock:
+            _switch_users -= 1
+            if _switch_users == 0:
+                sys.setswitchinterval(_switch_original)
+        return False
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class StackTracer:
+    """
+    Deterministic: sys.setprofile on the current thread only, attributing each call's self time (µs)
+    to its full stack. Catches every SQLAlchemy/thefuzz/C call even in a 2 ms request.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self._labels = {}
+
+    def _profile(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        if event == "call" or event == "c_call":
+            if event == "call":
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = frame_label(code)
+            else:
+                label = f"{getattr(arg, '__qualname__', None) or getattr(arg, '__name__', '?')} (builtin)"
+            parent = self._stack[-1][0] if self._stack else self._root
+            self._stack.append([f"{parent};{label}", now, 0])
+            self.samples += 1
+        elif self._stack:
+            # return / c_return / c_exception
+            key, start, child = self._stack.pop()
+            total = now - start
+            self.stacks[key] += (total - child) // 1000
+            if self._stack:
+                self._stack[-1][2] += total
+
+    def __enter__(self):
+        frames, frame = [], sys._getframe(1)
+        while frame is not None:
+            frames.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        self._root = ";".join(reversed(frames))
+        self._stack = []
+        sys.setprofile(self._profile)
+        return self
+
+    def __exit__(self, *exc):
+        sys.setprofile(None)
+        return False
+
+    def collapsed(self):
+        return "".join(f"{stack} {us}\n" for stack, us in self.stacks.most_common() if us > 0)
+
+def profile_filename(query: str, started: float):
+    slug = re.sub(r"[^a-z0-9]+", "_", query.lower()).strip("_")[:40] or "empty"
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(started)) + f"{started % 1:.3f}"[1:]
+    return f"{stamp}_{slug}.collapsed"
+
+class Profiler:
+    """Decides which requests get profiled (header or sampled) and stores their collapsed stacks."""
+
+    def __init__(self, sample_pct: float = PROFILE_SAMPLE_PCT, mode: str = PROFILE_MODE, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.sample_pct = sample_pct
+        self.mode = mode
+        self.directory = directory
+        self.keep = keep
+        self.recent = deque(maxlen=50)
+        self.lock = threading.Lock()
+
+    def sampled(self):
+        # Hot path when profiling is off: one float comparison
+        return self.sample_pct > 0 and random.random() * 100 < self.sample_pct
+
+    def run(self, query: str, fn, *args, **kwargs):
+        """Calls fn(*args, **kwargs) under the configured profiler; returns (result, profile file name)."""
+        started = time.time()
+        start = time.perf_counter()
+        with (StackTracer() if self.mode == "trace" else StackSampler()) as sampler:
+            result = fn(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        name = profile_filename(query, started)
+        try:
+            self._write(name, sampler.collapsed())
+        except OSError as e:
+            logger.warning("Could not write profile %s: %s", name, e)
+            return result, None
+
+        with self.lock:
+            self.recent.appendleft({"file": name, "query": query, "ms": round(elapsed_ms, 3), "samples": sampler.samples})
+        return result, name
+
+    def _write(self, name, content):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(content)
+        # Bounded disk use: keep the newest `keep` profiles
+        files = sorted(n for n in os.listdir(self.directory) if n.endswith(".collapsed"))
+        for old in files[:-self.keep] if len(files) > self.keep else []:
+            os.remove(os.path.join(self.directory, old))
+
+    def path_for(self, name: str):
+        """Absolute path of a stored profile, or None for unknown/unsafe names."""
+        if os.path.basename(name) != name or not name.endswith(".collapsed"):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.exists(path) else None
+
+    def as_dict(self):
+        with self.lock:
+            recent = list(self.recent)
+        return {
+            "sample_pct": self.sample_pct,
+            "mode": self.mode,
+            "weights": "self time (µs)" if self.mode == "trace" else f"samples every {PROFILE_INTERVAL_MS} ms",
+            "directory": self.directory,
+            "recent": recent,
+        }
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import time
+import queue
+import logging
+import threading
+from contextvars import ContextVar
+from contextlib import contextmanager
+from ..database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Structured /search access log: rotating JSONL files, one entry per request ("" = off).
+# scripts/query_log_report.py analyzes them; warmup replays the hottest queries from them.
+QUERY_LOG_DIR = os.environ.get("QUERY_LOG_DIR", os.path.join(os.path.dirname(DB_PATH), "query_logs"))
+# Entries waiting for the writer; when full, new entries are dropped (and counted), never waited on
+QUERY_LOG_QUEUE_SIZE = int(os.environ.get("QUERY_LOG_QUEUE_SIZE", "10000"))
+# A worker's current file rolls over at this size; the newest QUERY_LOG_KEEP rolled files (all workers) are kept
+QUERY_LOG_MAX_BYTES = int(os.environ.get("QUERY_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+QUERY_LOG_KEEP = int(os.environ.get("QUERY_LOG_KEEP", "20"))
+
+# One writer per uvicorn worker, each with its own files: queries-<pid>.jsonl, rolled to queries-<pid>-<stamp>.jsonl
+LOG_FILE = re.compile(r"^queries-(\d+)(-\d{8}T\d{6}\.\d{3})?\.jsonl$")
+FLUSH_INTERVAL = 1.0
+
+_timer = ContextVar("query_log_timer", default=None)
+
+class StageTimer:
+    """Per-stage wall time (ms) of one search; each lap is charged the time since the previous one."""
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = round(self.stages.get(stage, 0) + (now - self._last) * 1000, 3)
+        self._last = now
+
+@contextmanager
+def timed():
+    """Collects lap() calls made by this thread/context until exit."""
+    timer = StageTimer()
+    token = _timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _timer.reset(token)
+
+def lap(stage: str):
+    # Outside a logged request (scripts, tests, warmup) this is one ContextVar lookup
+    timer = _timer.get()
+    if timer is not None:
+        timer.lap(stage)
+
+def search_scenario(result: dict):
+    """Which search_logic branch answered: "pure" (symbol listing), "fno" (one underlying) or "global"."""
+    if result.get("result_type") == "UNIVERSAL_SEARCH" or result.get("status") == "no_match":
+        return "pure"
+    return "global" if result.get("underlying") == "GLOBAL_SEARCH" else "fno"
+
+def log_files(directory: str = QUERY_LOG_DIR, rolled_only: bool = False):
+    """Every worker's log files, least recently written first."""
+    if not directory or not os.path.isdir(directory):
+        return []
+    files = []
+    for name in os.listdir(directory):
+        m = LOG_FILE.match(name)
+        if m and (m.group(2) or not rolled_only):
+            path = os.path.join(directory, name)
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                # Rotated or pruned by another worker meanwhile
+                continue
+    return [path for _, path in sorted(files)]
+
+def pid_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by someone else
+        return True
+    return True
+
+class QueryLog:
+    """
+    Non-blocking access log. Request threads only put_nowait() a dict on a bounded queue; one writer
+    thread serializes, appends and rotates. A slow or full disk costs dropped entries, never latency.
+    Each worker process writes (and rotates) only its own file, so lines never interleave.
+    """
+
+    def __init__(self, directory: str = QUERY_LOG_DIR, queue_size: int = QUERY_LOG_QUEUE_SIZE,
+                 max_bytes: int = QUERY_LOG_MAX_BYTES, keep: int = QUERY_LOG_KEEP):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.written = 0
+        self.dropped = 0
+        self._dropped_reported = 0
+        self._file = None
+        self.pid = None
+
+    def start(self):
+        if not self.directory or self.thread is not None:
+            return
+        # Started from the app lifespan, i.e. in the worker process itself (after any fork)
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self._run, name="query-log-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flushes what is queued, then stops the writer."""
+        thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    def log(self, entry: dict):
+        if self.thread is None:
+            return
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            # Racy counter by design: an approximate drop count is fine, a lock here is not
+            self.dropped += 1
+
+    def _run(self):
+        try:
+            self._roll_orphans()
+        except OSError as e:
+            logger.warning("Could not roll orphaned query logs: %s", e)
+        while True:
+            try:
+                entry = self.queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                self._flush()
+                continue
+            batch = [entry]
+            # Drain whatever else is waiting: one write() per batch, not per request
+            while len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            try:
+                self._write([e for e in batch if e is not None])
+            except Exception as e:
+                logger.warning("Query log write failed (%d entries lost): %s", len(batch), e)
+                self._close()
+            if stopping:
+                self._close()
+                return
+
+    def _write(self, entries):
+        dropped = self.dropped - self._dropped_reported
+        if dropped:
+            # Marks the gap in the log itself, so the analyzer can report it
+            entries.append({"ts": round(time.time(), 3), "event": "dropped", "count": dropped})
+            self._dropped_reported += dropped
+        if not entries:
+            return
+        f = self._open()
+        f.write("".join(json.dumps(e, separators=(",", ":"), default=str) + "\n" for e in entries))
+        self.written += len(entries)
+        if f.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _flush(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except OSError as e:
+                logger.warning("Query log flush failed: %s", e)
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self._current_path(), "a", encoding="utf-8")
+        return self._file
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _current_path(self):
+        return os.path.join(self.directory, f"queries-{self.pid}.jsonl")
+
+    def _roll(self, path, pid, when):
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(when)) + f"{when % 1:.3f}"[1:]
+        # The pid keeps workers rotating in the same millisecond from overwriting each other
+        os.replace(path, os.path.join(self.directory, f"queries-{pid}-{stamp}.jsonl"))
+
+    def _roll_orphans(self):
+        """Current files of workers that exited (restart, deploy) are rolled, so pruning covers them too."""
+        rolled = False
+        for path in log_files(self.directory):
+            m = LOG_FILE.match(os.path.basename(path))
+            pid = int(m.group(1))
+            if m.group(2) or pid == self.pid or pid_alive(pid):
+                continue
+            try:
+                self._roll(path, pid, os.path.getmtime(path))
+                rolled = True
+            except FileNotFoundError:
+                # Another worker rolled it first
+                continue
+        if rolled:
+            self._prune()
+
+    def _rotate(self):
+        self._close()
+        self._roll(self._current_path(), self.pid, time.time())
+        self._prune()
+
+    def _prune(self):
+        # Bounded disk use: keep the newest `keep` rolled files
+        rolled = log_files(self.directory, rolled_only=True)
+        for old in rolled[:-self.keep] if len(rolled) > self.keep else []:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                # Another worker pruned it first
+                pass
+
+    def as_dict(self):
+        return {
+            "directory": self.directory or None,
+            "file": os.path.basename(self._current_path()) if self.pid else None,
+            "running": self.thread is not None,
+            "queued": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,182 @@
+import os
+import struct
+import pickle
+import hashlib
+import logging
+import threading
+from array import array
+from sqlalchemy.orm import Session
+from ..database import Instrument, DB_PATH
+from .brand_search import build_brand_matcher, set_brand_matcher
+from .snapshot import Snapshot, write_snapshot, get_snapshot, reload_snapshot, SNAPSHOT_PATH
+
+logger = logging.getLogger(__name__)
+
+# --- ARTIFACT FORMAT ---
+# header: magic, artifact version, source fingerprint (sha256), payload sha256, payload length
+# payload: pickled SearchIndex
+# Bump ARTIFACT_VERSION whenever SearchIndex gains/changes a structure; old files are then rebuilt.
+ARTIFACT_MAGIC = b"TSIDX\x00\x00\x00"
+ARTIFACT_VERSION = 5
+HEADER = struct.Struct("<8sI32s32sQ")
+
+ARTIFACT_PATH = os.environ.get("SEARCH_INDEX_PATH", os.path.join(os.path.dirname(DB_PATH), "search_index.bin"))
+
+def source_fingerprint(db_path: str = DB_PATH):
+    """
+    Cheap identity of market.db: the SQLite header (file change counter, page count, schema cookie)
+    plus the file size. Any committed reseed changes it; reading it costs one 100-byte read.
+    """
+    if not os.path.exists(db_path):
+        return b"\x00" * 32
+    with open(db_path, "rb") as f:
+        header = f.read(100)
+    return hashlib.sha256(header + str(os.path.getsize(db_path)).encode()).digest()
+
+class SearchIndex:
+    """Every structure search derives from the instruments/brand tables, built offline and loaded at boot."""
+
+    def __init__(self, snapshot_version, underlying_symbols, brand_matcher, ranks, chains, keyset):
+        self.snapshot_version = snapshot_version
+        # Fuzzy choices, in the order the DISTINCT query returns them (extractOne breaks ties by position)
+        self.underlying_symbols = underlying_symbols
+        self.brand_matcher = brand_matcher
+        # get_instrument_rank() per snapshot row
+        self.ranks = ranks
+        # option_chain.ChainIndex: per-underlying, per-expiry CE/PE rows aligned by strike
+        self.chains = chains
+        # keyset.KeysetIndex: per-underlying expiry blocks for ordered, paginated F&O scans
+        self.keyset = keyset
+
+def build_search_index(db: Session, snap: Snapshot):
+    from .search_service import get_instrument_rank
+    from .option_chain import ChainIndex
+    from .keyset import KeysetIndex
+
+    underlying_symbols = [s[0] for s in db.query(Instrument.Symbol).filter(
+        Instrument.InstrumentType.in_([1, 2])
+    ).distinct().all()]
+
+    ranks = array("b", (get_instrument_rank(snap[i]) for i in range(len(snap))))
+
+    return SearchIndex(
+        snap.data_version, underlying_symbols, build_brand_matcher(db), ranks,
+        ChainIndex.build(snap), KeysetIndex.build(snap, ranks)
+    )
+
+def save_search_index(index: SearchIndex, fingerprint: bytes, path: str = ARTIFACT_PATH):
+    payload = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    header = HEADER.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, fingerprint, hashlib.sha256(payload).digest(), len(payload))
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return path
+
+def read_search_index(fingerprint: bytes, path: str = ARTIFACT_PATH):
+    """Returns (index, None) for a usable artifact, else (None, reason)."""
+    if not os.path.exists(path):
+        return None, "missing"
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    if len(raw) < HEADER.size:
+        return None, "truncated"
+
+    magic, version, source, checksum, length = HEADER.unpack_from(raw, 0)
+    if magic != ARTIFACT_MAGIC or version != ARTIFACT_VERSION:
+        return None, f"version {version} != {ARTIFACT_VERSION}"
+    if source != fingerprint:
+        return None, "stale (market.db changed)"
+
+    payload = memoryview(raw)[HEADER.size:]
+    if len(payload) != length or hashlib.sha256(payload).digest() != checksum:
+        return None, "checksum mismatch"
+
+    index = pickle.loads(payload)
+    snap = get_snapshot()
+    if snap is None or snap.data_version != index.snapshot_version:
+        return None, "snapshot version mismatch"
+    return index, None
+
+def build_artifacts(db: Session, snapshot_path: str = SNAPSHOT_PATH, path: str = ARTIFACT_PATH):
+    """Offline build: snapshot + search index, both tied to the current market.db."""
+    fingerprint = source_fingerprint()
+    write_snapshot(db, snapshot_path)
+    snap = Snapshot(snapshot_path)
+    index = build_search_index(db, snap)
+    save_search_index(index, fingerprint, path)
+    snap.close()
+    return index
+
+# --- PROCESS-WIDE INDEX ---
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index():
+    return _index
+
+# market.db's fingerprint when the installed index was loaded, and the data version /search serves from
+_source_fingerprint = None
+_data_version = None
+
+def install_search_index(index, fingerprint: bytes = None):
+    global _index, _source_fingerprint
+    with _index_lock:
+        _index = index
+        _source_fingerprint = fingerprint if fingerprint is not None else source_fingerprint()
+    set_brand_matcher(index.brand_matcher if index else None)
+    refresh_data_version()
+
+def load_search_index(db: Session):
+    """
+    Boot path: load the prebuilt artifact, or rebuild it from market.db when it is missing/stale.
+    The rebuilt artifact is written back (best effort) so the next boot is fast again.
+    """
+    fingerprint = source_fingerprint()
+    reload_snapshot()
+    index, reason = read_search_index(fingerprint)
+
+    if index is None:
+        logger.warning("Search index artifact unusable (%s); rebuilding from %s", reason, DB_PATH)
+        try:
+            write_snapshot(db, SNAPSHOT_PATH)
+        except OSError as e:
+            logger.warning("Could not write snapshot: %s", e)
+        reload_snapshot()
+        snap = get_snapshot()
+        if snap is None:
+            return None
+        index = build_search_index(db, snap)
+        try:
+            save_search_index(index, fingerprint)
+        except OSError as e:
+            logger.warning("Could not write search index artifact: %s", e)
+
+    install_search_index(index, fingerprint)
+    return index
+
+def refresh_data_version():
+    """
+    Recomputes the version of the data /search answers from: market.db's fingerprint as of the index load
+    (SQL paths, and what a reseed changes), the snapshot version when the loaded index serves the F&O scan,
+    and the trading date once expired contracts are being excluded. Called when the index is installed and
+    when the calendar rolls over, so it follows what this process has loaded, not the files on disk.
+    """
+    global _data_version
+    from .expiry_calendar import get_expiry_calendar
+    parts = [_source_fingerprint if _source_fingerprint is not None else source_fingerprint()]
+    index, snap = _index, get_snapshot()
+    if index is not None and snap is not None and snap.data_version == index.snapshot_version:
+        parts.append(snap.data_version.encode())
+    calendar = get_expiry_calendar()
+    if calendar is not None and calendar.cutoff:
+        # Answers also change when contracts expire at day rollover
+        parts.append(calendar.trading_date.isoformat().encode())
+    _data_version = hashlib.sha256(b"".join(parts)).hexdigest()[:16]
+    return _data_version
+
+def serving_data_version():
+    """The cached data version (see refresh_data_version): no I/O, safe on the event loop."""
+    return _data_version or refresh_data_version()
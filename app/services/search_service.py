@@ -3,6 +3,13 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
 from ..database import Instrument
+from .brand_search import get_brand_matcher
+from .search_index import get_search_index
+from .snapshot import get_snapshot, expiry_ordinal
+from .expiry_calendar import get_expiry_calendar
+from .keyset import KeysetScan, FAR_EXPIRY, CursorError, strike_intervals, query_fingerprint, encode_cursor, decode_cursor
+from .budget import stage_allowed, mark_degraded, DEGRADED_FETCH_LIMIT
+from .query_log import lap
 from thefuzz import process, fuzz
 
 # --- CONSTANTS ---
@@ -11,23 +18,55 @@ OPTION_TYPES = r"\b(CE|PE|CALL|PUT)\b"
 FUTURES_TAGS = r"\b(FUT|FUTURE|FUTURES)\b"
 STRIKE_K_NOTATION = r"\b(\d+(\.\d+)?)[kK]\b" 
 STRIKE_NORMAL = r"\b(\d{4,6})\b"
+STRIKE_TOKEN = r"(\d+(?:\.\d+)?K|\d{4,6})"
+STRIKE_RANGE = rf"\b{STRIKE_TOKEN}\s*(?:-|\bTO\b)\s*{STRIKE_TOKEN}\b"
+STRIKE_RANGE_SHARED_K = r"\b(\d{1,3}(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)K\b"
+STRIKE_ANY = rf"\b{STRIKE_TOKEN}\b"
 EXPIRY_DAY = r"\b(\d{1,2})\b"
 
+def strike_value(token: str):
+    return float(token[:-1]) * 1000 if token.endswith("K") else float(token)
+
+def merge_strike_ranges(ranges):
+    merged = []
+    for lo, hi in sorted([min(r), max(r)] for r in ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
 def parse_query(query: str):
     q_upper = query.upper().strip()
     
     # 1. Strike Price
+    # 1a. Ranges ("24000-25000", "24k to 25k", "24-25k") and lists ("50k 51k") -> strikes, strike = None
     strike = None
-    k_match = re.search(STRIKE_K_NOTATION, q_upper)
-    if k_match:
-        val = float(k_match.group(1))
-        strike = val * 1000
-        q_upper = q_upper.replace(k_match.group(0), "")
+    strikes = None
+    ranges = []
+    def take_range(m, shared_k=False):
+        lo, hi = (float(m.group(1)) * 1000, float(m.group(2)) * 1000) if shared_k else (strike_value(m.group(1)), strike_value(m.group(2)))
+        ranges.append([lo, hi])
+        return " "
+    q_multi = re.sub(STRIKE_RANGE, take_range, q_upper)
+    q_multi = re.sub(STRIKE_RANGE_SHARED_K, lambda m: take_range(m, shared_k=True), q_multi)
+    tokens = re.findall(STRIKE_ANY, q_multi)
+
+    if ranges or len(tokens) >= 2:
+        strikes = merge_strike_ranges(ranges + [[strike_value(t), strike_value(t)] for t in tokens])
+        q_upper = re.sub(STRIKE_ANY, " ", q_multi)
     else:
-        s_match = re.search(STRIKE_NORMAL, q_upper)
-        if s_match:
-            strike = float(s_match.group(1))
-            q_upper = q_upper.replace(s_match.group(0), "")
+        # 1b. Single strike
+        k_match = re.search(STRIKE_K_NOTATION, q_upper)
+        if k_match:
+            val = float(k_match.group(1))
+            strike = val * 1000
+            q_upper = q_upper.replace(k_match.group(0), "")
+        else:
+            s_match = re.search(STRIKE_NORMAL, q_upper)
+            if s_match:
+                strike = float(s_match.group(1))
+                q_upper = q_upper.replace(s_match.group(0), "")
 
     # 2. Expiry Day
     expiry_day = None
@@ -60,6 +99,7 @@ def parse_query(query: str):
     return {
         "raw_symbol": symbol_text,
         "strike": strike,
+        "strikes": strikes,
         "expiry_month": expiry_month,
         "expiry_day": expiry_day,
         "opt_type": opt_type,
@@ -73,52 +113,97 @@ def parse_date(date_str):
     except:
         return datetime.max
 
+def drop_expired(results, calendar):
+    """Removes contracts that expired before the calendar's trading date (SQL paths; the index skips them)."""
+    if calendar is None or not calendar.cutoff:
+        return results
+    return [r for r in results if calendar.is_active(expiry_ordinal(r.ExpiryDate))]
+
+def active_filter(calendar):
+    """drop_expired as a WHERE clause, so expired rows are left out before a fetch limit applies (None = nothing to exclude)."""
+    if calendar is None or not calendar.expired:
+        return None
+    return or_(Instrument.ExpiryDate.is_(None), Instrument.ExpiryDate.notin_(calendar.expired))
+
 def get_futures_by_id(underlying_id: int, db: Session):
+    index, snap, calendar = get_search_index(), get_snapshot(), get_expiry_calendar()
+    if calendar is not None and snap is not None and snap.data_version == index.snapshot_version:
+        # Active expiry blocks are already in expiry order: walk them until three futures are found
+        itype = snap.columns["InstrumentType"]
+        order = snap.order_chain
+        futs = []
+        for _, lo, hi in calendar.blocks(underlying_id):
+            futs.extend(snap[row] for row in sorted(order[p] for p in range(lo, hi) if itype[order[p]] in (4, 6)))
+            if len(futs) >= 3:
+                break
+        return futs[:3]
+
     futs = db.query(Instrument).filter(
         Instrument.UnderlyingInstrumentId == underlying_id,
         Instrument.InstrumentType.in_([4, 6])
     ).all()
+    futs = drop_expired(futs, calendar)
     futs.sort(key=lambda x: parse_date(x.ExpiryDate))
     return futs[:3]
 
-def resolve_symbol(symbol_text: str, db: Session):
+def resolve_exact(symbol_text: str, db: Session):
     """
-    Identifies the correct underlying instrument.
+    Exact symbol lookup among equities/indices.
     Fixes the 'Twin Problem' (BSE vs NSE) by checking which one actually has derivatives.
     """
-    if not symbol_text: return None, False
-
-    # 1. Exact Match
     exact_matches = db.query(Instrument).filter(
         Instrument.Symbol == symbol_text,
         Instrument.InstrumentType.in_([1, 2])
     ).all()
     
-    if exact_matches:
-        # If we found multiple "DIXON"s, we need to find the "Parent"
-        if len(exact_matches) > 1:
-            best_candidate = exact_matches[0] # Default to first
+    if not exact_matches:
+        return None
+
+    # If we found multiple "DIXON"s, we need to find the "Parent"
+    if len(exact_matches) > 1:
+        best_candidate = exact_matches[0] # Default to first
+        
+        for cand in exact_matches:
+            # Priority 1: Indices are always masters
+            if cand.InstrumentType == 2:
+                return cand
             
-            for cand in exact_matches:
-                # Priority 1: Indices are always masters
-                if cand.InstrumentType == 2:
-                    return cand, False
-                
-                # Priority 2: Check if this candidate acts as a parent
-                # We query for just ONE child to confirm parentage
-                has_child = db.query(Instrument.InstrumentId).filter(
-                    Instrument.UnderlyingInstrumentId == cand.InstrumentId
-                ).first()
-                
-                if has_child:
-                    return cand, False
+            # Priority 2: Check if this candidate acts as a parent
+            # We query for just ONE child to confirm parentage
+            has_child = db.query(Instrument.InstrumentId).filter(
+                Instrument.UnderlyingInstrumentId == cand.InstrumentId
+            ).first()
             
-            # If no derivatives found for any, default to the first one
-            return best_candidate, False
-        else:
-            return exact_matches[0], False
+            if has_child:
+                return cand
+        
+        # If no derivatives found for any, default to the first one
+        return best_candidate
 
-    # 2. Prefix Match
+    return exact_matches[0]
+
+def resolve_symbol(symbol_text: str, db: Session, deadline=None):
+    """
+    Identifies the correct underlying instrument.
+    Order: exact symbol -> brand/product alias ("MAGGI" -> NESTLEIND) -> prefix -> fuzzy.
+    Fuzzy correction is skipped when the request's latency budget is nearly spent.
+    """
+    if not symbol_text: return None, False
+
+    # 1. Exact Match
+    exact_hero = resolve_exact(symbol_text, db)
+    if exact_hero:
+        return exact_hero, False
+
+    # 2. Brand / Product Alias (in-memory; the hero comes from the matcher's build-time listing, no SQL)
+    matcher = get_brand_matcher(db)
+    for alias_symbol, _ in matcher.match(symbol_text):
+        listing = matcher.listings.get(alias_symbol)
+        if listing:
+            inst_id, display, itype = listing
+            return Instrument(InstrumentId=inst_id, Symbol=alias_symbol, DisplaySymbol=display, InstrumentType=itype), False
+
+    # 3. Prefix Match
     candidates = db.query(Instrument).filter(
         Instrument.Symbol.like(f"{symbol_text}%"),
         Instrument.InstrumentType.in_([1, 2])
@@ -127,11 +212,18 @@ def resolve_symbol(symbol_text: str, db: Session):
         candidates.sort(key=lambda x: (len(x.Symbol), x.Symbol))
         return candidates[0], False
 
-    # 3. Fuzzy Match
-    all_symbols = db.query(Instrument.Symbol).filter(
-        Instrument.InstrumentType.in_([1, 2])
-    ).distinct().all()
-    choices = [s[0] for s in all_symbols]
+    # 4. Fuzzy Match (choices come prebuilt from the search index artifact when it is loaded)
+    if not stage_allowed(deadline, "fuzzy"):
+        return None, False
+
+    index = get_search_index()
+    if index is not None:
+        choices = index.underlying_symbols
+    else:
+        all_symbols = db.query(Instrument.Symbol).filter(
+            Instrument.InstrumentType.in_([1, 2])
+        ).distinct().all()
+        choices = [s[0] for s in all_symbols]
     match, score = process.extractOne(symbol_text, choices, scorer=fuzz.ratio)
     
     if score >= 80:
@@ -167,21 +259,31 @@ def get_instrument_rank(inst):
         return 40 if is_future else 41
     return 50 if is_future else 51
 
-def search_logic(query: str, db: Session):
+def search_logic(query: str, db: Session, deadline=None, cursor: str = None, page_size: int = 10, use_index: bool = True):
+    """
+    deadline: optional budget.Deadline. When it runs low, optional stages (fuzzy correction,
+    partial listing, range fallback, full-size fetch) are skipped and the response is marked degraded.
+    cursor/page_size: F&O results are paged; pass the previous response's next_cursor to continue.
+    Raises CursorError for a cursor that is malformed or belongs to another query/data version.
+    use_index=False forces the original SQL fetch + sort for F&O (reference engine in shadow runs).
+    """
     parsed = parse_query(query)
+    lap("parse")
     
     symbol_text = parsed["raw_symbol"]
     strike = parsed["strike"]
     
     is_pure_search = not (
         strike or 
+        parsed["strikes"] or 
         parsed["is_future"] or 
         parsed["opt_type"] or 
         parsed["expiry_month"] or 
         parsed["expiry_day"]
     )
 
-    hero, is_typo_fixed = resolve_symbol(symbol_text, db)
+    hero, is_typo_fixed = resolve_symbol(symbol_text, db, deadline)
+    lap("resolve")
 
     # ==========================================================
     # SCENARIO 1: PURE SEARCH
@@ -207,8 +309,25 @@ def search_logic(query: str, db: Session):
                     "type": "FUT",
                     "priority": 2
                 })
+        lap("futures")
 
-        if not is_typo_fixed:
+        # Every other brand/product alias in the query, strongest weight first
+        matcher = get_brand_matcher(db)
+        for alias_symbol, _ in matcher.match(symbol_text):
+            listing = matcher.listings.get(alias_symbol)
+            if not listing or listing[0] in seen_ids or (hero and alias_symbol == hero.Symbol):
+                continue
+            inst_id, display, itype = listing
+            results.append({
+                "display_name": display,
+                "symbol": alias_symbol,
+                "type": "INDEX" if itype == 2 else "EQUITY",
+                "priority": 3
+            })
+            seen_ids.add(inst_id)
+        lap("aliases")
+
+        if not is_typo_fixed and stage_allowed(deadline, "partials"):
             partials = db.query(Instrument).filter(
                 Instrument.Symbol.like(f"{symbol_text}%"),
                 Instrument.InstrumentType.in_([1, 2])
@@ -223,19 +342,20 @@ def search_logic(query: str, db: Session):
                         "priority": 3
                     })
                     seen_ids.add(p.InstrumentId)
+        lap("partials")
 
         results.sort(key=lambda x: x['priority'])
 
         if not results:
-             return {"status": "no_match", "message": f"No symbol found matching '{symbol_text}'"}
+             return mark_degraded({"status": "no_match", "message": f"No symbol found matching '{symbol_text}'"}, deadline)
 
-        return {
+        return mark_degraded({
             "status": "success",
             "result_type": "UNIVERSAL_SEARCH",
             "underlying": symbol_text,
             "is_typo_fixed": is_typo_fixed,
             "matches": results
-        }
+        }, deadline)
 
     # ==========================================================
     # SCENARIO 2: SPECIFIC F&O / GLOBAL SEARCH
@@ -250,7 +370,7 @@ def search_logic(query: str, db: Session):
     
     if parsed["is_future"]:
         query_filters.append(Instrument.InstrumentType.in_([4, 6]))
-    elif strike:
+    elif strike or parsed["strikes"]:
         query_filters.append(Instrument.InstrumentType.in_([3, 5]))
     elif parsed["expiry_day"]:
         query_filters.append(Instrument.InstrumentType.in_([3, 4, 5, 6]))
@@ -267,50 +387,120 @@ def search_logic(query: str, db: Session):
         query_filters.append(Instrument.ExpiryDate.like(f"{parsed['expiry_day']:02d}-%"))
 
     # --- EXECUTE ---
-    final_results = []
-    
-    if strike:
-        strict_filters = query_filters.copy()
-        strict_filters.append(or_(
-            Instrument.StrikePrice == strike,
-            Instrument.StrikePrice == strike * 100
-        ))
-        if parsed["opt_type"]:
-             strict_filters.append(Instrument.DisplaySymbol.like(f"%{parsed['opt_type']}%"))
-             
-        final_results = db.query(Instrument).filter(and_(*strict_filters)).limit(50000).all()
+    underlying_id = underlying_obj.InstrumentId if underlying_obj else None
+    fingerprint = query_fingerprint(parsed, underlying_id)
+    after = decode_cursor(cursor, fingerprint) if cursor else None
 
-        if not final_results:
-            range_filters = query_filters.copy()
-            min_s, max_s = strike * 0.95, strike * 1.05
-            min_s_100, max_s_100 = (strike * 100) * 0.95, (strike * 100) * 1.05
-            
-            range_filters.append(or_(
-                and_(Instrument.StrikePrice >= min_s, Instrument.StrikePrice <= max_s),
-                and_(Instrument.StrikePrice >= min_s_100, Instrument.StrikePrice <= max_s_100)
-            ))
-            
-            if parsed["opt_type"]:
-                range_filters.append(Instrument.DisplaySymbol.like(f"%{parsed['opt_type']}%"))
-
-            final_results = db.query(Instrument).filter(and_(*range_filters)).limit(50000).all()
+    index = get_search_index()
+    snap = get_snapshot()
+    if use_index and index is not None and snap is not None and snap.data_version == index.snapshot_version:
+        page, next_cursor = keyset_page(snap, index, parsed, underlying_id, after, page_size, fingerprint, deadline)
     else:
-        final_results = db.query(Instrument).filter(and_(*query_filters)).limit(50000).all()
+        page, next_cursor = sql_page(db, parsed, query_filters, after, page_size, fingerprint, deadline)
+    lap("page")
 
-    # --- FORMATTING & SORTING ---
+    # --- FORMATTING ---
     formatted_results = []
     
-    if underlying_obj:
+    if underlying_obj and after is None:
         formatted_results.append({
             "display_name": underlying_obj.DisplaySymbol,
             "symbol": underlying_obj.Symbol,
-            "type": "SPOT",
-            "expiry_sort": datetime.min,
-            "dist_score": 0,
-            "strike_val": 0,
-            "rank": 0
+            "type": "SPOT"
         })
 
+    formatted_results.extend(page)
+        
+    return mark_degraded({
+        "status": "success",
+        "search_parsed": parsed,
+        "underlying": underlying_obj.Symbol if underlying_obj else "GLOBAL_SEARCH",
+        "is_typo_fixed": is_typo_fixed,
+        "matches": formatted_results,
+        "next_cursor": next_cursor
+    }, deadline)
+
+def keyset_page(snap, index, parsed: dict, underlying_id, after, page_size: int, fingerprint: str, deadline=None):
+    """One page of F&O matches, walked in sort order over the snapshot; cost follows page_size, not the match count."""
+    after_key = None
+    if after:
+        mode, key, instrument_id = after
+        row = snap.row_for_id(instrument_id)
+        if row is None:
+            raise CursorError("Cursor refers to an instrument that no longer exists")
+        after_key = key + (row,)
+    else:
+        mode = "strict"
+
+    calendar = get_expiry_calendar()
+    keys, has_more = KeysetScan(snap, index, parsed, underlying_id, mode, calendar).page(after_key, page_size)
+
+    # Exact strike(s) missed entirely -> +/-5% range (only decided on the first page)
+    if not keys and after is None and (parsed["strike"] or parsed["strikes"]) and stage_allowed(deadline, "range_fallback"):
+        mode = "range"
+        keys, has_more = KeysetScan(snap, index, parsed, underlying_id, mode, calendar).page(None, page_size)
+
+    itype = snap.columns["InstrumentType"]
+    page = [{
+        "display_name": snap.string("DisplaySymbol", key[4]),
+        "symbol": snap.string("Symbol", key[4]),
+        "type": "FUT" if itype[key[4]] in [4, 6] else "OPT"
+    } for key in keys]
+
+    next_cursor = None
+    if has_more:
+        last = keys[-1]
+        next_cursor = encode_cursor(mode, last, snap.columns["InstrumentId"][last[4]], fingerprint)
+    return page, next_cursor
+
+def strike_predicate(intervals):
+    """StrikePrice in any of the closed intervals (SQL fallback only; the keyset path bisects instead)."""
+    return or_(*[
+        Instrument.StrikePrice == lo if lo == hi else and_(Instrument.StrikePrice >= lo, Instrument.StrikePrice <= hi)
+        for lo, hi in intervals
+    ])
+
+def sql_page(db: Session, parsed: dict, query_filters: list, after, page_size: int, fingerprint: str, deadline=None):
+    """Fallback when no search index is loaded: fetch every match, sort, then cut the page out."""
+    strike = parsed["strike"]
+    mode = after[0] if after else "strict"
+    # A cursor names a position in the full ordering, so next pages are never cut to the degraded limit
+    fetch_limit = 50000 if after or stage_allowed(deadline, "full_fetch") else DEGRADED_FETCH_LIMIT
+    final_results = []
+    has_strikes = bool(strike_intervals(parsed, "strict"))
+    calendar = get_expiry_calendar()
+    expiry_filter = active_filter(calendar)
+    if expiry_filter is not None:
+        query_filters = query_filters + [expiry_filter]
+    truncated = False
+
+    def fetch(filters):
+        nonlocal truncated
+        rows = db.query(Instrument).filter(and_(*filters)).limit(fetch_limit).all()
+        truncated = len(rows) >= fetch_limit
+        # Expiry spellings the WHERE clause does not know are still caught here
+        return drop_expired(rows, calendar)
+
+    if has_strikes and mode == "strict":
+        strict_filters = query_filters.copy()
+        strict_filters.append(strike_predicate(strike_intervals(parsed, "strict")))
+        if parsed["opt_type"]:
+             strict_filters.append(Instrument.DisplaySymbol.like(f"%{parsed['opt_type']}%"))
+             
+        final_results = fetch(strict_filters)
+
+    if has_strikes and not final_results and (mode == "range" or (after is None and stage_allowed(deadline, "range_fallback"))):
+        mode = "range"
+        range_filters = query_filters.copy()
+        range_filters.append(strike_predicate(strike_intervals(parsed, "range")))
+        
+        if parsed["opt_type"]:
+            range_filters.append(Instrument.DisplaySymbol.like(f"%{parsed['opt_type']}%"))
+
+        final_results = fetch(range_filters)
+    elif not has_strikes:
+        final_results = fetch(query_filters)
+
     temp_list = []
     for res in final_results:
         temp_list.append({
@@ -320,23 +510,32 @@ def search_logic(query: str, db: Session):
             "expiry_sort": parse_date(res.ExpiryDate),
             "dist_score": calculate_distance(res, strike),
             "strike_val": res.StrikePrice if res.StrikePrice else 0,
-            "rank": get_instrument_rank(res)
+            "rank": get_instrument_rank(res),
+            "id": res.InstrumentId
         })
         
     temp_list.sort(key=lambda x: (x["rank"], x["expiry_sort"], x["dist_score"], x["strike_val"]))
-    
-    formatted_results.extend(temp_list[:10])
-    
-    for item in formatted_results:
+
+    start = 0
+    if after:
+        ids = [item["id"] for item in temp_list]
+        if after[2] not in ids:
+            raise CursorError("Cursor refers to an instrument that no longer matches")
+        start = ids.index(after[2]) + 1
+    page = temp_list[start:start + page_size]
+
+    next_cursor = None
+    # A degraded fetch that hit its limit was sorted from a partial set: no cursor into an ordering that is not the real one
+    if start + page_size < len(temp_list) and not (truncated and fetch_limit == DEGRADED_FETCH_LIMIT):
+        last = page[-1]
+        expiry = last["expiry_sort"]
+        key = (last["rank"], FAR_EXPIRY if expiry == datetime.max else expiry.toordinal(), last["dist_score"], last["strike_val"])
+        next_cursor = encode_cursor(mode, key, last["id"], fingerprint)
+
+    for item in page:
         item.pop("expiry_sort", None)
         item.pop("dist_score", None)
         item.pop("strike_val", None)
         item.pop("rank", None)
-        
-    return {
-        "status": "success",
-        "search_parsed": parsed,
-        "underlying": underlying_obj.Symbol if underlying_obj else "GLOBAL_SEARCH",
-        "is_typo_fixed": is_typo_fixed,
-        "matches": formatted_results
-    }
\ No newline at end of file
+        item.pop("id", None)
+    return page, next_cursor
@@ -0,0 +1,208 @@
+import os
+import time
+import random
+import logging
+import importlib
+import threading
+from collections import deque
+from ..database import SessionLocal
+from .search_service import search_logic, parse_query
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: candidate engine to shadow live /search traffic with (registry name or "module:function"); unset = off
+SHADOW_ENGINE = os.environ.get("SHADOW_ENGINE")
+SHADOW_SAMPLE_PCT = float(os.environ.get("SHADOW_SAMPLE_PCT", "1"))
+SHADOW_KEEP_DIVERGENCES = 50
+
+def search_logic_sql(query, db):
+    """The original SQL fetch + Python sort for F&O, ignoring the prebuilt search index."""
+    return search_logic(query, db, use_index=False)
+
+# Engines are callables (query, db) -> search_logic-shaped dict
+ENGINES = {
+    "search_logic": search_logic,
+    "sql": search_logic_sql,
+}
+
+def load_engine(spec: str):
+    if spec in ENGINES:
+        return ENGINES[spec]
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown engine '{spec}' (use one of {sorted(ENGINES)} or 'module:function')")
+    return getattr(importlib.import_module(module_name), attr)
+
+def query_category(query: str):
+    parsed = parse_query(query)
+    if parsed["strikes"]:
+        return "strike_range"
+    if parsed["strike"]:
+        return "strike+type" if parsed["opt_type"] else "strike"
+    if parsed["is_future"]:
+        return "future"
+    if parsed["opt_type"]:
+        return "option_type"
+    if parsed["expiry_month"] or parsed["expiry_day"]:
+        return "expiry"
+    return "pure"
+
+def match_names(result: dict):
+    """Ordered display names, the same projection tests/test_runner.py scores."""
+    if result.get("status") != "success":
+        return []
+    return [m["display_name"] for m in result.get("matches", [])]
+
+# Test-suite scoring, shared with tests/test_runner.py
+def calculate_score_and_errors(expected, actual):
+    score = 100
+    errors = []
+
+    exp_set = set(expected)
+    act_set = set(actual)
+
+    missing = exp_set - act_set
+    extra = act_set - exp_set
+
+    if missing:
+        count = len(missing)
+        score -= (count * 10)
+        errors.append(f"Missing {count} items: {', '.join(missing)}")
+    
+    if extra:
+        count = len(extra)
+        score -= (count * 10)
+        errors.append(f"Extra {count} items: {', '.join(extra)}")
+
+    if score > 0:
+        seq_errors = []
+        for i in range(len(expected)):
+            if i < len(actual) and expected[i] != actual[i]:
+                score -= 5
+                seq_errors.append(f"Pos {i}: Expected '{expected[i]}' != Got '{actual[i]}'")
+        
+        if seq_errors:
+            errors.append("Sequence Errors: " + "; ".join(seq_errors))
+
+    return max(0, score), " | ".join(errors) if errors else "None"
+
+def diff_matches(reference: list, candidate: list):
+    """(score, mistakes) of the candidate's ordered matches against the reference's; 100/'None' = identical."""
+    if reference == candidate:
+        return 100, "None"
+    score, mistakes = calculate_score_and_errors(reference, candidate)
+    if score == 100:
+        # Same set and prefix, but one side has duplicates or a longer tail
+        score, mistakes = 95, f"Length {len(reference)} != {len(candidate)}"
+    return score, mistakes
+
+def timed(engine, query, db):
+    start = time.perf_counter()
+    try:
+        result = engine(query, db)
+    except Exception as e:
+        db.rollback()
+        result = {"status": "error", "message": str(e)}
+    return result, (time.perf_counter() - start) * 1000
+
+class CategoryStats:
+    __slots__ = ("runs", "divergences", "score_total", "reference_ms", "candidate_ms")
+
+    def __init__(self):
+        self.runs = 0
+        self.divergences = 0
+        self.score_total = 0
+        self.reference_ms = 0.0
+        self.candidate_ms = 0.0
+
+    def add(self, score, reference_ms, candidate_ms):
+        self.runs += 1
+        self.divergences += score < 100
+        self.score_total += score
+        self.reference_ms += reference_ms
+        self.candidate_ms += candidate_ms
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "divergences": self.divergences,
+            "avg_score": round(self.score_total / self.runs, 1) if self.runs else None,
+            "reference_avg_ms": round(self.reference_ms / self.runs, 3) if self.runs else None,
+            "candidate_avg_ms": round(self.candidate_ms / self.runs, 3) if self.runs else None,
+            "speedup": round(self.reference_ms / self.candidate_ms, 2) if self.candidate_ms else None,
+        }
+
+class ShadowReport:
+    """Per-category divergence + latency totals, and the most recent divergences."""
+
+    def __init__(self, keep: int = SHADOW_KEEP_DIVERGENCES):
+        self.categories = {}
+        self.divergences = deque(maxlen=keep)
+        self.lock = threading.Lock()
+
+    def record(self, query, reference_names, candidate_names, reference_ms, candidate_ms):
+        score, mistakes = diff_matches(reference_names, candidate_names)
+        category = query_category(query)
+        with self.lock:
+            self.categories.setdefault(category, CategoryStats()).add(score, reference_ms, candidate_ms)
+            if score < 100:
+                self.divergences.append({
+                    "query": query, "category": category, "score": score, "mistakes": mistakes,
+                    "reference": reference_names, "candidate": candidate_names,
+                })
+        return score, mistakes
+
+    def as_dict(self):
+        with self.lock:
+            categories = {k: v.as_dict() for k, v in sorted(self.categories.items())}
+            total = CategoryStats()
+            for stats in self.categories.values():
+                total.runs += stats.runs
+                total.divergences += stats.divergences
+                total.score_total += stats.score_total
+                total.reference_ms += stats.reference_ms
+                total.candidate_ms += stats.candidate_ms
+            return {"total": total.as_dict(), "categories": categories, "recent_divergences": list(self.divergences)}
+
+class ShadowMode:
+    """
+    Replays a sample of live /search queries through a candidate engine after the response is sent
+    (FastAPI background task) and compares it with what the reference search_logic served.
+    """
+
+    def __init__(self, engine_spec=SHADOW_ENGINE, sample_pct: float = SHADOW_SAMPLE_PCT):
+        self.engine_spec = engine_spec
+        self.engine = load_engine(engine_spec) if engine_spec else None
+        self.sample_pct = sample_pct
+        self.report = ShadowReport()
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.engine is not None and self.sample_pct > 0
+
+    def should_sample(self):
+        return self.enabled and random.random() * 100 < self.sample_pct
+
+    def run(self, query: str, reference_result: dict, reference_ms: float):
+        db = SessionLocal()
+        try:
+            candidate_result, candidate_ms = timed(self.engine, query, db)
+            if candidate_result.get("status") == "error":
+                self.errors += 1
+            score, mistakes = self.report.record(query, match_names(reference_result), match_names(candidate_result), reference_ms, candidate_ms)
+            if score < 100:
+                logger.warning("Shadow divergence for %r (score %d): %s", query, score, mistakes)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shadow run for %r failed: %s", query, e)
+        finally:
+            db.close()
+
+    def as_dict(self):
+        return {
+            "engine": self.engine_spec,
+            "sample_pct": self.sample_pct,
+            "errors": self.errors,
+            **self.report.as_dict(),
+        }
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+
+# Callers allowed to wait on one in-flight search; later arrivals run their own (0 = coalescing off)
+SEARCH_COALESCE_MAX_WAITERS = int(os.environ.get("SEARCH_COALESCE_MAX_WAITERS", "64"))
+# A waiter waits for the leader's remaining budget, but never less than this (ms)
+SEARCH_COALESCE_MIN_WAIT_MS = float(os.environ.get("SEARCH_COALESCE_MIN_WAIT_MS", "100"))
+
+class LeaderTimeout(Exception):
+    """The leader did not finish within its budget (plus the floor); the waiter gives up without rerunning fn."""
+
+def search_key(parsed: dict, cursor, page_size: int):
+    """Requests with equal keys get identical search_logic answers ("NIFTY " == "nifty")."""
+    return json.dumps([parsed, cursor, page_size], sort_keys=True)
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters", "expires")
+
+    def __init__(self, expires=None):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.expires = expires
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key (the leader) runs fn; callers
+    arriving while it runs wait and share its result, or re-raise its exception. The call is forgotten
+    as soon as it finishes, so only in-flight work is shared and nothing stale is ever served.
+    """
+
+    def __init__(self, max_waiters: int = SEARCH_COALESCE_MAX_WAITERS, min_wait_ms: float = SEARCH_COALESCE_MIN_WAIT_MS):
+        self.max_waiters = max_waiters
+        self.min_wait = min_wait_ms / 1000
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.overflow = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, *args, timeout=None, **kwargs):
+        """
+        Returns (result, shared). timeout: the caller's remaining budget in seconds. Waiters wait for the
+        leader's remaining budget (at least min_wait), however little of their own is left: a herd that
+        queued past its budget still shares the leader's answer instead of rerunning fn. Raises
+        LeaderTimeout if the leader is still running after that.
+        """
+        if self.max_waiters <= 0:
+            return fn(*args, **kwargs), False
+
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = _Call(time.perf_counter() + timeout if timeout is not None else None)
+                self.leaders += 1
+                leader = True
+            elif call.waiters >= self.max_waiters:
+                # Bounded herd: beyond max_waiters, callers run independently
+                self.overflow += 1
+                call, leader = None, False
+            else:
+                call.waiters += 1
+                leader = False
+
+        if call is None:
+            return fn(*args, **kwargs), False
+
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+                return call.result, False
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self.lock:
+                    if self.calls.get(key) is call:
+                        del self.calls[key]
+                call.done.set()
+
+        wait = None if call.expires is None else max(call.expires - time.perf_counter(), self.min_wait)
+        if not call.done.wait(wait):
+            with self.lock:
+                self.timeouts += 1
+            raise LeaderTimeout(f"Identical search still running after {wait * 1000:.0f} ms")
+        if call.error is not None:
+            raise call.error
+        with self.lock:
+            self.shared += 1
+        return call.result, True
+
+    def as_dict(self):
+        with self.lock:
+            in_flight = len(self.calls)
+            waiting = sum(c.waiters for c in self.calls.values())
+        return {
+            "max_waiters": self.max_waiters,
+            "min_wait_ms": self.min_wait * 1000,
+            "in_flight": in_flight,
+            "waiting": waiting,
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "overflow": self.overflow,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,311 @@
+import os
+import mmap
+import logging
+import struct
+import hashlib
+import threading
+import time
+from array import array
+from datetime import datetime
+from sqlalchemy import select, literal_column
+from sqlalchemy.orm import Session
+from ..database import Instrument, DB_PATH
+
+# --- FILE FORMAT ---
+# [header][section directory][sections...], little-endian, every section 8-byte aligned.
+#   header:    magic, format version, row count, built_at (epoch secs), sha256 of all section bytes
+#   directory: (name, offset, length) per section
+#   sections:  fixed-width column arrays, one offset array per string column, a shared
+#              string heap, and prebuilt sort orders (arrays of row numbers)
+# Rows are stored in SQLite rowid order, i.e. the order a table scan returns them. Every prebuilt order
+# breaks ties by row number, so snapshot-backed results tie-break exactly like the SQL queries do.
+MAGIC = b"TSSNAP\x00\x00"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sIIQ32sI")
+SECTION = struct.Struct("<24sQQ")
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", os.path.join(os.path.dirname(DB_PATH), "instruments.snap"))
+
+# (column, array typecode, null sentinel)
+NUMERIC_COLUMNS = [
+    ("InstrumentId", "q", -1),
+    ("InstrumentType", "b", -1),
+    ("Exchange", "b", -1),
+    ("Segment", "h", -1),
+    ("UnderlyingInstrumentId", "q", -1),
+    ("ExpiryType", "b", -1),
+    ("OptionType", "b", -1),
+    ("StrikePrice", "d", float("nan")),
+]
+STRING_COLUMNS = ["Symbol", "DisplaySymbol", "TradingSymbol", "Isin", "ExpiryDate"]
+
+# Derived column: ExpiryDate as a proleptic ordinal (0 = no/invalid expiry) so sorts and range checks stay numeric
+EXPIRY_ORDINAL = "ExpiryOrdinal"
+
+# Prebuilt orders
+ORDER_ID = "order.id"            # (InstrumentId)
+ORDER_SYMBOL = "order.symbol"    # (Symbol, row)
+ORDER_CHAIN = "order.chain"      # (UnderlyingInstrumentId, ExpiryOrdinal, StrikePrice, row)
+
+def expiry_ordinal(date_str):
+    if not date_str: return 0
+    try:
+        return datetime.strptime(date_str, "%d-%b-%y").toordinal()
+    except ValueError:
+        return 0
+
+def _chain_key(rows, i):
+    row = rows[i]
+    strike = row["StrikePrice"]
+    return (
+        row["UnderlyingInstrumentId"] if row["UnderlyingInstrumentId"] is not None else -1,
+        row[EXPIRY_ORDINAL],
+        strike if strike is not None else -1.0,
+        i,
+    )
+
+def _pad(buf: bytearray):
+    buf.extend(b"\x00" * (-len(buf) % 8))
+
+# ==========================================================
+# WRITER
+# ==========================================================
+def fetch_rows(db: Session):
+    cols = [getattr(Instrument, c) for c, _, _ in NUMERIC_COLUMNS] + [getattr(Instrument, c) for c in STRING_COLUMNS]
+    names = [c for c, _, _ in NUMERIC_COLUMNS] + STRING_COLUMNS
+    rows = []
+    for values in db.execute(select(*cols).order_by(literal_column("rowid").asc())):
+        row = dict(zip(names, values))
+        row[EXPIRY_ORDINAL] = expiry_ordinal(row["ExpiryDate"])
+        rows.append(row)
+    return rows
+
+def encode_snapshot(rows):
+    """Serializes instrument rows (dicts keyed by column name) into snapshot bytes."""
+    sections = []
+
+    for name, code, null in NUMERIC_COLUMNS:
+        sections.append((name, array(code, (null if r[name] is None else r[name] for r in rows))))
+    sections.append((EXPIRY_ORDINAL, array("i", (r[EXPIRY_ORDINAL] for r in rows))))
+
+    heap = bytearray()
+    for name in STRING_COLUMNS:
+        # Offsets are per column but point into the one shared heap
+        offsets = array("I", [len(heap)])
+        for r in rows:
+            value = r[name]
+            if value:
+                heap.extend(value.encode("utf-8"))
+            offsets.append(len(heap))
+        sections.append((name + ".off", offsets))
+    sections.append(("heap", heap))
+
+    by_id = sorted(range(len(rows)), key=lambda i: rows[i]["InstrumentId"])
+    by_symbol = sorted(range(len(rows)), key=lambda i: ((rows[i]["Symbol"] or "").encode("utf-8"), i))
+    by_chain = sorted(range(len(rows)), key=lambda i: _chain_key(rows, i))
+    sections.append((ORDER_ID, array("I", by_id)))
+    sections.append((ORDER_SYMBOL, array("I", by_symbol)))
+    sections.append((ORDER_CHAIN, array("I", by_chain)))
+
+    body = bytearray()
+    directory = []
+    start = HEADER.size + SECTION.size * len(sections)
+    start += -start % 8
+    for name, data in sections:
+        raw = data.tobytes() if isinstance(data, array) else bytes(data)
+        directory.append((name, start + len(body), len(raw)))
+        body.extend(raw)
+        _pad(body)
+
+    digest = hashlib.sha256(body).digest()
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, len(rows), int(time.time()), digest, len(sections)))
+    for name, offset, length in directory:
+        out.extend(SECTION.pack(name.encode("ascii"), offset, length))
+    _pad(out)
+    out.extend(body)
+    return bytes(out)
+
+def write_snapshot(db: Session, path: str = SNAPSHOT_PATH):
+    """Builds the snapshot from the instruments table and atomically replaces `path`."""
+    data = encode_snapshot(fetch_rows(db))
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # Readers that already mapped the old file keep their (still valid) inode
+    os.replace(tmp_path, path)
+    return path
+
+# ==========================================================
+# READER
+# ==========================================================
+class SnapshotRow:
+    """Read-only view of one snapshot row, attribute-compatible with `Instrument`."""
+    __slots__ = ("_snap", "row")
+
+    def __init__(self, snap, row):
+        self._snap = snap
+        self.row = row
+
+    def _num(self, name):
+        value = self._snap.columns[name][self.row]
+        if name == "StrikePrice":
+            return None if value != value else value
+        return None if value == -1 else value
+
+    InstrumentId = property(lambda self: self._snap.columns["InstrumentId"][self.row])
+    InstrumentType = property(lambda self: self._snap.columns["InstrumentType"][self.row])
+    Exchange = property(lambda self: self._num("Exchange"))
+    Segment = property(lambda self: self._num("Segment"))
+    UnderlyingInstrumentId = property(lambda self: self._num("UnderlyingInstrumentId"))
+    ExpiryType = property(lambda self: self._num("ExpiryType"))
+    OptionType = property(lambda self: self._num("OptionType"))
+    StrikePrice = property(lambda self: self._num("StrikePrice"))
+    ExpiryOrdinal = property(lambda self: self._snap.columns[EXPIRY_ORDINAL][self.row])
+    Symbol = property(lambda self: self._snap.string("Symbol", self.row))
+    DisplaySymbol = property(lambda self: self._snap.string("DisplaySymbol", self.row))
+    TradingSymbol = property(lambda self: self._snap.string("TradingSymbol", self.row))
+    Isin = property(lambda self: self._snap.string("Isin", self.row))
+    ExpiryDate = property(lambda self: self._snap.string("ExpiryDate", self.row))
+
+    def __repr__(self):
+        return f"<SnapshotRow {self.InstrumentId} {self.Symbol}>"
+
+class Snapshot:
+    """
+    Read-only, mmap-backed view of the instrument universe.
+    Columns are memoryview casts over the mapping, so every worker process shares the same page-cache pages.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_ino, stat.st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mm)
+
+        magic, version, count, built_at, digest, n_sections = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a v{FORMAT_VERSION} instrument snapshot")
+        self.row_count = count
+        self.built_at = built_at
+        self.data_version = digest.hex()[:16]
+
+        sections = {}
+        for i in range(n_sections):
+            name, offset, length = SECTION.unpack_from(buf, HEADER.size + i * SECTION.size)
+            sections[name.rstrip(b"\x00").decode("ascii")] = buf[offset:offset + length]
+
+        self.columns = {name: sections[name].cast(code) for name, code, _ in NUMERIC_COLUMNS}
+        self.columns[EXPIRY_ORDINAL] = sections[EXPIRY_ORDINAL].cast("i")
+        self.offsets = {name: sections[name + ".off"].cast("I") for name in STRING_COLUMNS}
+        self.heap = sections["heap"]
+        self.order_id = sections[ORDER_ID].cast("I")
+        self.order_symbol = sections[ORDER_SYMBOL].cast("I")
+        self.order_chain = sections[ORDER_CHAIN].cast("I")
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, row):
+        return SnapshotRow(self, row)
+
+    def string(self, name, row):
+        off = self.offsets[name]
+        a, b = off[row], off[row + 1]
+        return str(self.heap[a:b], "utf-8") if b > a else None
+
+    def _symbol_bytes(self, row):
+        off = self.offsets["Symbol"]
+        return bytes(self.heap[off[row]:off[row + 1]])
+
+    def _bound(self, order, key, target, upper):
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k = key(order[mid])
+            if k < target or (upper and k == target):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def symbol_prefix(self, prefix: str):
+        """Rows whose Symbol starts with `prefix`, in (Symbol, InstrumentId) order."""
+        p = prefix.encode("utf-8")
+        key = lambda row: self._symbol_bytes(row)[:len(p)]
+        lo = self._bound(self.order_symbol, key, p, False)
+        hi = self._bound(self.order_symbol, key, p, True)
+        return self.order_symbol[lo:hi]
+
+    def symbol_exact(self, symbol: str):
+        s = symbol.encode("utf-8")
+        lo = self._bound(self.order_symbol, self._symbol_bytes, s, False)
+        hi = self._bound(self.order_symbol, self._symbol_bytes, s, True)
+        return self.order_symbol[lo:hi]
+
+    def row_for_id(self, instrument_id: int):
+        ids = self.columns["InstrumentId"]
+        pos = self._bound(self.order_id, ids.__getitem__, instrument_id, False)
+        if pos < len(self.order_id) and ids[self.order_id[pos]] == instrument_id:
+            return self.order_id[pos]
+        return None
+
+    def derivatives(self, underlying_id: int):
+        """Rows under `underlying_id`, in (expiry, strike, row) order."""
+        col = self.columns["UnderlyingInstrumentId"]
+        key = lambda row: col[row]
+        lo = self._bound(self.order_chain, key, underlying_id, False)
+        hi = self._bound(self.order_chain, key, underlying_id, True)
+        return self.order_chain[lo:hi]
+
+    def close(self):
+        for view in list(self.columns.values()) + list(self.offsets.values()):
+            view.release()
+        for view in (self.heap, self.order_id, self.order_symbol, self.order_chain):
+            view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            # A caller still holds a slice of the mapping; the OS unmaps it when that goes away
+            pass
+
+# --- PROCESS-WIDE SNAPSHOT ---
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def _open_snapshot():
+    try:
+        return Snapshot(SNAPSHOT_PATH)
+    except ValueError as e:
+        # Written by an older format; load_search_index() rebuilds it
+        logger.warning("Ignoring snapshot: %s", e)
+        return None
+
+def get_snapshot():
+    """The mapped snapshot for this process, or None when it has not been built yet."""
+    global _snapshot
+    if _snapshot is None and os.path.exists(SNAPSHOT_PATH):
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = _open_snapshot()
+    return _snapshot
+
+def reload_snapshot():
+    """Remaps the snapshot if the file on disk was replaced. Returns True when the version changed."""
+    global _snapshot
+    if not os.path.exists(SNAPSHOT_PATH):
+        return False
+    stat = os.stat(SNAPSHOT_PATH)
+    with _snapshot_lock:
+        if _snapshot is not None and _snapshot.file_id == (stat.st_ino, stat.st_mtime_ns):
+            return False
+        previous = _snapshot
+        _snapshot = _open_snapshot()
+    if _snapshot is None:
+        return False
+    return previous is None or previous.data_version != _snapshot.data_version
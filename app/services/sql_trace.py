@@ -0,0 +1,153 @@
+import os
+import re
+import time
+import logging
+from contextvars import ContextVar
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..database import engine
+
+logger = logging.getLogger(__name__)
+
+# Production guard rails for /search: warn when one request issues more than this many statements (0 = off)
+SQL_WARN_STATEMENTS = int(os.environ.get("SQL_WARN_STATEMENTS", "10"))
+# ...and (once per statement shape) when a statement's plan scans a table instead of searching an index
+SQL_WARN_SCANS = os.environ.get("SQL_WARN_SCANS", "1") == "1"
+PLAN_CACHE_SIZE = 1024
+
+# "SCAN instruments", "SCAN instruments USING INDEX ix_..." (every row, in index order), "SCAN TABLE x" (SQLite < 3.36)
+SCAN_DETAIL = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+NOT_TABLES = {"CONSTANT", "SUBQUERY"}
+
+# Plans depend on the statement text, not on the bound values: EXPLAIN once per shape
+_plans = {}
+_warned_scans = set()
+_current = ContextVar("sql_trace", default=None)
+
+def explain_plan(dbapi_conn, statement, parameters):
+    """EXPLAIN QUERY PLAN rows as indented detail lines (sqlite3 shell style), cached per statement text."""
+    plan = _plans.get(statement)
+    if plan is None:
+        rows = dbapi_conn.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        depth = {0: -1}
+        plan = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            plan.append("  " * depth[node_id] + detail)
+        if len(_plans) >= PLAN_CACHE_SIZE:
+            _plans.clear()
+        _plans[statement] = plan
+    return plan
+
+def short_sql(statement):
+    """One line, with the ORM's column list elided."""
+    return re.sub(r"^SELECT (DISTINCT )?.+? FROM ", r"SELECT \1... FROM ", " ".join(statement.split()))
+
+def scanned_tables(plan):
+    tables = []
+    for line in plan:
+        m = SCAN_DETAIL.match(line.strip())
+        if m and m.group(1) not in NOT_TABLES and "COVERING INDEX" not in line:
+            tables.append(m.group(1))
+    return tables
+
+class SqlTrace:
+    """SQL issued by one request. explain=True keeps every statement with its plan, rows and time."""
+
+    def __init__(self, label: str, explain: bool = False):
+        self.label = label
+        self.explain = explain
+        self.count = 0
+        self.sql_ms = 0.0
+        self.scans = []
+        self.statements = []
+
+    def record(self, cursor, statement, parameters, elapsed_ms, executemany):
+        self.count += 1
+        self.sql_ms += elapsed_ms
+        is_select = not executemany and statement.lstrip()[:6].upper() == "SELECT"
+        if not is_select or not (self.explain or SQL_WARN_SCANS):
+            if self.explain:
+                self.statements.append({"sql": statement, "params": parameters, "execute_ms": round(elapsed_ms, 3)})
+            return
+
+        plan = explain_plan(cursor.connection, statement, parameters)
+        scans = scanned_tables(plan)
+        self.scans.extend(scans)
+        if scans and not self.explain and statement not in _warned_scans:
+            _warned_scans.add(statement)
+            logger.warning("Table scan (%s) for %r: %s | %s", ", ".join(scans), self.label, short_sql(statement), "; ".join(p.strip() for p in plan))
+        if self.explain:
+            self.statements.append({
+                "sql": statement,
+                "params": list(parameters) if isinstance(parameters, tuple) else parameters,
+                "plan": plan,
+                "table_scans": scans,
+                "execute_ms": round(elapsed_ms, 3),
+            })
+
+    def check(self):
+        """Production warnings, once the request is done."""
+        if SQL_WARN_STATEMENTS and self.count > SQL_WARN_STATEMENTS:
+            logger.warning("%r issued %d SQL statements (> %d, %.1f ms in SQL)", self.label, self.count, SQL_WARN_STATEMENTS, self.sql_ms)
+
+    def as_dict(self):
+        return {
+            "summary": {
+                "statements": self.count,
+                "sql_ms": round(self.sql_ms, 3),
+                "rows": sum(s.get("rows", 0) for s in self.statements),
+                "table_scans": sorted(set(self.scans)),
+            },
+            "statements": self.statements,
+        }
+
+@contextmanager
+def traced(label: str, explain: bool = False):
+    """Collects the SQL this thread/context issues until exit."""
+    trace = SqlTrace(label, explain)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        if not explain:
+            trace.check()
+
+# --- ENGINE / SESSION EVENTS ---
+# With no trace active (scripts, tests, warmup) each hook is one ContextVar lookup.
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("sql_trace_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    if trace is None or not conn.info.get("sql_trace_start"):
+        return
+    elapsed_ms = (time.perf_counter() - conn.info["sql_trace_start"].pop()) * 1000
+    try:
+        trace.record(cursor, statement, parameters, elapsed_ms, executemany)
+    except Exception as e:
+        # Diagnostics never fail the request
+        logger.warning("SQL trace failed for %r: %s", trace.label, e)
+
+@event.listens_for(Session, "do_orm_execute")
+def _count_rows(orm_execute_state):
+    """
+    Explain mode only: runs the statement to completion here (execute + fetch + ORM loading) so rows and
+    total time can be attached to the statement(s) it issued; the caller gets an equivalent frozen result.
+    """
+    trace = _current.get()
+    if trace is None or not trace.explain or not orm_execute_state.is_select:
+        return None
+    first = len(trace.statements)
+    start = time.perf_counter()
+    frozen = orm_execute_state.invoke_statement().freeze()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    for s in trace.statements[first:]:
+        s["rows"] = len(frozen.data)
+        s["ms"] = round(elapsed_ms, 3)
+    return frozen()
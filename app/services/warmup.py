@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from ..database import SessionLocal, engine
+from .search_index import load_search_index
+from .snapshot import get_snapshot
+from .search_service import search_logic
+from .query_log import QUERY_LOG_DIR, log_files
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Historical queries to replay: the /search query log directory (services/query_log.py), JSONL with a
+# "query"/"q" field per line, or plain text one query per line
+WARMUP_QUERIES_FILE = os.environ.get("WARMUP_QUERIES_FILE", QUERY_LOG_DIR or os.path.join(ROOT_DIR, "requests.jsonl"))
+WARMUP_TOP_N = int(os.environ.get("WARMUP_TOP_N", "50"))
+# Most recent query log entries counted (bounds boot-time reading when the logs are large)
+WARMUP_LOG_ENTRIES = int(os.environ.get("WARMUP_LOG_ENTRIES", "200000"))
+
+# Used when there is no history yet (fresh deploy)
+DEFAULT_WARMUP_QUERIES = [
+    "nifty", "banknifty", "finnifty", "sensex", "reliance",
+    "nifty ce", "nifty pe", "nifty fut", "banknifty ce", "banknifty pe",
+    "nifty 26k", "banknifty 50k pe", "nifti", "rel", "bank",
+]
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.started_at = None
+        self.finished_at = None
+        self.queries_replayed = 0
+        self.errors = 0
+        self.failure = None     # why warmup could not make this worker servable (it then never turns ready)
+
+    def as_dict(self):
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None,
+            "queries_replayed": self.queries_replayed,
+            "errors": self.errors,
+            "failure": self.failure,
+        }
+
+state = WarmupState()
+
+def load_hot_queries(path: str = WARMUP_QUERIES_FILE, top_n: int = WARMUP_TOP_N, fallback: bool = True):
+    """
+    Top-N most frequent queries from the history file (or query log directory), most frequent first.
+    Without any history: DEFAULT_WARMUP_QUERIES, or [] when fallback=False.
+    """
+    counts = Counter()
+    # Query log: newest files first, first pages only, up to WARMUP_LOG_ENTRIES entries
+    paths = list(reversed(log_files(path))) if os.path.isdir(path) else [path] if os.path.exists(path) else []
+    budget = WARMUP_LOG_ENTRIES if os.path.isdir(path) else None
+    for file_path in paths:
+        if budget is not None and budget <= 0:
+            break
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("cursor") or record.get("event"):
+                        continue
+                    query = record.get("query") or record.get("q")
+                else:
+                    query = line
+                if isinstance(query, str) and query.strip():
+                    counts[query.strip().lower()] += 1
+                    if budget is not None:
+                        budget -= 1
+                        if budget <= 0:
+                            break
+
+    if not counts:
+        return DEFAULT_WARMUP_QUERIES[:top_n] if fallback else []
+    return [q for q, _ in counts.most_common(top_n)]
+
+def touch_snapshot(snap):
+    """Faults every snapshot page into this process' mapping (they are shared page-cache pages)."""
+    total = 0
+    for view in list(snap.columns.values()) + list(snap.offsets.values()) + [snap.heap, snap.order_id, snap.order_symbol, snap.order_chain]:
+        raw = view.cast("B") if view.format != "B" else view
+        # One byte per 4 KB page is enough to map it
+        total += sum(raw[::4096])
+    return total
+
+def run_warmup(queries=None):
+    state.started_at = time.time()
+    db = SessionLocal()
+    try:
+        # 1. Engine + ORM: open the pool's first connection, configure mappers
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        configure_mappers()
+
+        # 2. Indexes: prebuilt artifact (or rebuild), then fault the snapshot in
+        index = load_search_index(db)
+        snap = get_snapshot()
+        if index is None or snap is None:
+            # Nothing to serve from (empty/missing market.db, unwritable data dir): stay not ready
+            raise RuntimeError(f"search index unavailable (index={'loaded' if index is not None else 'missing'}, "
+                               f"snapshot={'mapped' if snap is not None else 'missing'})")
+        touch_snapshot(snap)
+
+        # 3. Replay hot queries: warms SQLite's page cache, thefuzz, and every in-process cache
+        for query in (queries if queries is not None else load_hot_queries()):
+            try:
+                search_logic(query, db)
+                state.queries_replayed += 1
+            except Exception as e:
+                state.errors += 1
+                logger.warning("Warmup query %r failed: %s", query, e)
+        # Only a worker whose engine and index came up takes traffic; a failed hot query is not fatal
+        state.ready = True
+    except Exception as e:
+        state.errors += 1
+        state.failure = f"{type(e).__name__}: {e}"
+        logger.exception("Warmup failed: %s", e)
+    finally:
+        db.close()
+        state.finished_at = time.time()
+        logger.info("Warmup finished in %.2fs (%d queries)", state.finished_at - state.started_at, state.queries_replayed)
+
+def start_warmup():
+    """Runs warmup off the event loop so / stays live while /ready reports 503."""
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
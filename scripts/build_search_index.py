@@ -0,0 +1,30 @@
+import sys
+import os
+import time
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.search_index import build_artifacts, ARTIFACT_PATH
+from app.services.snapshot import SNAPSHOT_PATH
+
+def build_search_index():
+    """Run after scripts/seed_db.py (or seed_brands.py) to precompute every structure the API loads at boot."""
+    db = SessionLocal()
+    print("🏗️  Building instrument snapshot + search index from market.db...")
+    start_time = time.time()
+    try:
+        index = build_artifacts(db)
+    except Exception as e:
+        print(f"❌ Error building search artifacts: {e}")
+        return
+    finally:
+        db.close()
+
+    print(f"✅ Snapshot:     {SNAPSHOT_PATH} ({os.path.getsize(SNAPSHOT_PATH) / 1024:.0f} KB, version {index.snapshot_version})")
+    print(f"✅ Search index: {ARTIFACT_PATH} ({os.path.getsize(ARTIFACT_PATH) / 1024:.0f} KB)")
+    print(f"   {len(index.underlying_symbols)} symbols, {index.brand_matcher.size} brand aliases, built in {time.time() - start_time:.2f} seconds.")
+
+if __name__ == "__main__":
+    build_search_index()
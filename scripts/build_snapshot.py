@@ -0,0 +1,28 @@
+import sys
+import os
+import time
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.services.snapshot import write_snapshot, Snapshot, SNAPSHOT_PATH
+
+def build_snapshot(path=SNAPSHOT_PATH):
+    db = SessionLocal()
+    print(f"📦 Building instrument snapshot at {path}...")
+    start_time = time.time()
+    try:
+        write_snapshot(db, path)
+    except Exception as e:
+        print(f"❌ Error building snapshot: {e}")
+        return
+    finally:
+        db.close()
+
+    snap = Snapshot(path)
+    print(f"✅ Wrote {len(snap)} rows ({os.path.getsize(path) / 1024:.0f} KB, version {snap.data_version}) in {time.time() - start_time:.2f} seconds.")
+    snap.close()
+
+if __name__ == "__main__":
+    build_snapshot(sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH)
@@ -1,10 +1,24 @@
 import sys
 import os
+import json
+import time
+import argparse
+import multiprocessing
+from array import array
+from collections import deque
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 # Add parent directory to path so we can import from app
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal
+from app.database import SessionLocal, engine, DB_PATH
 from app.services.search_service import search_logic
+from app.services.search_index import load_search_index, read_search_index, install_search_index, source_fingerprint
+from app.services.snapshot import reload_snapshot
+
+CHUNK_SIZE = 256          # queries per task sent to a worker
+MAX_PENDING_CHUNKS = 4    # per worker; bounds memory when streaming huge inputs
+MEMO_SIZE = 100000        # per worker: statements/dumps repeat the same references a lot
 
 def run_interactive_tool():
     db = SessionLocal()
@@ -49,5 +63,151 @@ def run_interactive_tool():
                 print(f"   {m['symbol']:<25} {m['type']:<10} {m['display_name']}")
         print("\n")
 
+# ==========================================================
+# BULK MODE
+# ==========================================================
+_worker_db = None
+_worker_memo = {}
+
+def init_worker():
+    """Per process: its own read-only SQLite engine, plus the mmap'd snapshot + search index (never rebuilt here)."""
+    global _worker_db
+    ro_engine = create_engine(
+        f"sqlite:///file:{DB_PATH}?mode=ro&uri=true", connect_args={"check_same_thread": False}
+    )
+    _worker_db = sessionmaker(autocommit=False, autoflush=False, bind=ro_engine)()
+
+    reload_snapshot()
+    fingerprint = source_fingerprint()
+    index, _ = read_search_index(fingerprint)
+    install_search_index(index, fingerprint)
+
+def resolve_chunk(chunk):
+    """[(line_no, query)] -> [(line_no, ndjson_line, elapsed_ms, status)] in the same order; elapsed_ms is None for memo hits."""
+    out = []
+    for line_no, query in chunk:
+        start = time.perf_counter()
+        result = _worker_memo.get(query)
+        memo_hit = result is not None
+        if not memo_hit:
+            try:
+                result = search_logic(query, _worker_db)
+            except Exception as e:
+                _worker_db.rollback()
+                result = {"status": "error", "message": str(e)}
+            if len(_worker_memo) >= MEMO_SIZE:
+                _worker_memo.clear()
+            _worker_memo[query] = result
+        # A memo hit costs a dict lookup; timing it would only drag the percentiles towards 0
+        elapsed_ms = None if memo_hit else (time.perf_counter() - start) * 1000
+
+        record = {"line": line_no, "query": query, "ms": round(elapsed_ms, 3) if elapsed_ms is not None else None, "memo": memo_hit}
+        record.update(result)
+        out.append((line_no, json.dumps(record, default=str), elapsed_ms, result.get("status")))
+    return out
+
+def read_chunks(stream, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for line_no, line in enumerate(stream, 1):
+        query = line.strip()
+        if not query:
+            continue
+        chunk.append((line_no, query))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_bulk(input_path, output_path=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Resolves every non-empty line of `input_path` ('-' = stdin) with search_logic and writes one JSON object
+    per query to `output_path` (default stdout), in input order. Progress and the throughput report go to stderr.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    # 1. Make sure the snapshot + search index on disk match market.db before workers map them
+    db = SessionLocal()
+    try:
+        load_search_index(db)
+    finally:
+        db.close()
+    engine.dispose()
+
+    source = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    sink = sys.stdout if not output_path else open(output_path, "w", encoding="utf-8")
+
+    timings = array("d")
+    statuses = {}
+    counts = {"total": 0, "memo_hits": 0}
+    start = time.perf_counter()
+
+    def write(results):
+        for _, ndjson_line, elapsed_ms, status in results:
+            sink.write(ndjson_line + "\n")
+            if elapsed_ms is None:
+                counts["memo_hits"] += 1
+            else:
+                timings.append(elapsed_ms)
+            statuses[status] = statuses.get(status, 0) + 1
+        counts["total"] += len(results)
+        if counts["total"] % 100000 < len(results):
+            rate = counts["total"] / (time.perf_counter() - start)
+            print(f"   ... {counts['total']:,} queries ({rate:,.0f}/s)", file=sys.stderr)
+
+    # 2. Fan chunks out; results are consumed strictly in submission order, so output keeps input order
+    try:
+        if workers == 1:
+            init_worker()
+            for chunk in read_chunks(source, chunk_size):
+                write(resolve_chunk(chunk))
+        else:
+            with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+                pending = deque()
+                for chunk in read_chunks(source, chunk_size):
+                    pending.append(pool.apply_async(resolve_chunk, (chunk,)))
+                    if len(pending) >= workers * MAX_PENDING_CHUNKS:
+                        write(pending.popleft().get())
+                while pending:
+                    write(pending.popleft().get())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        else:
+            sink.flush()
+
+    # 3. Throughput report
+    elapsed = time.perf_counter() - start
+    report_throughput(timings, statuses, elapsed, workers, counts["total"], counts["memo_hits"])
+
+def report_throughput(timings, statuses, elapsed, workers, total, memo_hits=0):
+    """timings: search_logic runs only (memo misses); total includes memo hits."""
+    print("\n" + "="*50, file=sys.stderr)
+    print(f"✅ Resolved {total:,} queries in {elapsed:.2f}s with {workers} worker(s)", file=sys.stderr)
+    if not total:
+        return
+    print(f"   Throughput: {total / elapsed:,.0f} queries/s", file=sys.stderr)
+    print(f"   Memo hits:  {memo_hits:,} ({memo_hits / total:.1%}; repeated lines, answered without searching)", file=sys.stderr)
+    if not timings:
+        return
+    ordered = sorted(timings)
+    searched = len(ordered)
+    pct = lambda p: ordered[min(searched - 1, int(p / 100 * searched))]
+    print(f"   Per search: p50 {pct(50):.2f} ms | p95 {pct(95):.2f} ms | p99 {pct(99):.2f} ms | max {ordered[-1]:.2f} ms", file=sys.stderr)
+    print("   Status:     " + ", ".join(f"{k}={v:,}" for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))), file=sys.stderr)
+    print("="*50, file=sys.stderr)
+
 if __name__ == "__main__":
-    run_interactive_tool()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Interactive market search, or bulk resolution of a query file.")
+    parser.add_argument("--bulk", metavar="FILE", help="Resolve one query per line from FILE ('-' for stdin) as NDJSON")
+    parser.add_argument("-o", "--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Queries per worker task")
+    args = parser.parse_args()
+
+    if args.bulk:
+        run_bulk(args.bulk, args.output, args.workers, args.chunk_size)
+    else:
+        run_interactive_tool()
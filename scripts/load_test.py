@@ -0,0 +1,368 @@
+import sys
+import os
+import json
+import time
+import random
+import socket
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import itertools
+import subprocess
+from urllib.parse import quote
+from urllib.request import urlopen
+from urllib.error import URLError, HTTPError
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+DEFAULT_DB = os.path.join(ROOT_DIR, "data", "market.db")
+
+# Share of /search traffic per query shape (same buckets as shadow.query_category, plus typos)
+QUERY_MIX = {
+    "pure": 35,
+    "strike+type": 25,
+    "option_type": 10,
+    "expiry": 10,
+    "future": 8,
+    "strike": 7,
+    "typo": 5,
+}
+# Symbol popularity is heavily skewed towards the indices: weight of the i-th underlying ~ 1 / (i + 1)
+HOT_UNDERLYINGS = 300
+MONTHS = {"JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"}
+
+# ==========================================================
+# QUERY MIX
+# ==========================================================
+def load_universe(db_path):
+    """Underlyings (indices first) and a sample of their option DisplaySymbols, straight from SQLite."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        underlyings = conn.execute("""
+            SELECT u.InstrumentId, u.Symbol FROM instruments u
+            WHERE u.InstrumentType IN (1, 2)
+              AND EXISTS (SELECT 1 FROM instruments d WHERE d.UnderlyingInstrumentId = u.InstrumentId)
+            ORDER BY u.InstrumentType DESC, u.InstrumentId
+            LIMIT ?""", (HOT_UNDERLYINGS,)).fetchall()
+        options = {}
+        for uid, symbol in underlyings:
+            rows = conn.execute(
+                "SELECT DisplaySymbol FROM instruments WHERE UnderlyingInstrumentId = ? AND InstrumentType IN (3, 5) LIMIT 400", (uid,)
+            ).fetchall()
+            options[symbol] = [r[0] for r in rows]
+    finally:
+        conn.close()
+    return [symbol for _, symbol in underlyings], options
+
+def option_parts(display):
+    """'NIFTY 30 DEC 24000 CE' -> ('30', 'DEC', '24000', 'CE'), or None for other layouts."""
+    tokens = display.split()
+    for i in range(len(tokens) - 3):
+        if tokens[i].isdigit() and tokens[i + 1] in MONTHS:
+            return tokens[i], tokens[i + 1], tokens[i + 2], tokens[-1]
+    return None
+
+def typo(symbol, rng):
+    if len(symbol) < 4:
+        return symbol
+    i = rng.randrange(1, len(symbol) - 1)
+    return symbol[:i] + symbol[i + 1] + symbol[i] + symbol[i + 2:]
+
+def build_query_mix(db_path, count, seed=7):
+    """`count` queries drawn from QUERY_MIX over Zipf-weighted underlyings; the same list for every configuration."""
+    rng = random.Random(seed)
+    symbols, options = load_universe(db_path)
+    if not symbols:
+        raise SystemExit(f"❌ No underlyings with derivatives in {db_path}")
+    symbol_weights = [1 / (i + 1) for i in range(len(symbols))]
+    shapes, shape_weights = zip(*QUERY_MIX.items())
+
+    queries = []
+    while len(queries) < count:
+        shape = rng.choices(shapes, shape_weights)[0]
+        symbol = rng.choices(symbols, symbol_weights)[0]
+        s = symbol.lower()
+        parts = option_parts(rng.choice(options[symbol])) if options[symbol] else None
+        if shape == "pure":
+            queries.append(s if rng.random() < 0.8 else s[:max(3, len(s) // 2)])
+        elif shape == "typo":
+            queries.append(typo(s, rng))
+        elif shape == "future":
+            queries.append(f"{s} fut")
+        elif shape == "option_type":
+            queries.append(f"{s} {rng.choice(['ce', 'pe'])}")
+        elif parts is None:
+            continue
+        elif shape == "expiry":
+            day, month, _, _ = parts
+            queries.append(f"{s} {day} {month.lower()}" if rng.random() < 0.5 else f"{s} {month.lower()}")
+        elif shape == "strike":
+            queries.append(f"{s} {parts[2]}")
+        else:
+            queries.append(f"{s} {parts[2]} {parts[3].lower()}")
+    return queries
+
+def load_query_file(path, count, seed=7):
+    """Replays a history file (one query per line, or JSONL with "query"/"q"), sampled by frequency."""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                line = str(record.get("query") or record.get("q") or "").strip()
+            if line:
+                queries.append(line)
+    if not queries:
+        raise SystemExit(f"❌ No queries in {path}")
+    rng = random.Random(seed)
+    return [rng.choice(queries) for _ in range(count)]
+
+# ==========================================================
+# SERVER
+# ==========================================================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def prepare_data(workdir, db_path=None, contracts=None):
+    """Environment pointing the app at a fixture or synthetic market.db, with artifacts prebuilt in `workdir`."""
+    env = dict(os.environ)
+    if contracts:
+        db_path = os.path.join(workdir, f"synthetic_{contracts}.db")
+        print(f"🏗️  Building a synthetic universe of {contracts:,} contracts...")
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "synthetic_universe.py"), str(contracts), db_path], check=True, env=env)
+    env["MARKET_DB_PATH"] = os.path.abspath(db_path)
+    env["SNAPSHOT_PATH"] = os.path.join(workdir, "instruments.snap")
+    env["SEARCH_INDEX_PATH"] = os.path.join(workdir, "search_index.bin")
+    # Keep the server focused on /search: no shadow replays, no sampled profiles
+    env.pop("SHADOW_ENGINE", None)
+    env["PROFILE_SAMPLE_PCT"] = "0"
+    # Synthetic traffic must not reach data/query_logs, where warmup would replay it as the hot queries.
+    # Logging stays on (it is part of serving cost), into the scratch dir
+    env["QUERY_LOG_DIR"] = os.path.join(workdir, "query_logs")
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "build_search_index.py")], check=True, env=env, cwd=ROOT_DIR)
+    return env
+
+class Server:
+    """uvicorn app.main:app in a child process; ready once /ready answers 200."""
+
+    def __init__(self, env, workers, threads=0, extra_env=None, timeout=120):
+        self.port = free_port()
+        self.env = dict(env, THREADPOOL_SIZE=str(threads), **(extra_env or {}))
+        self.workers = workers
+        self.timeout = timeout
+        self.proc = None
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(self.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=ROOT_DIR, env=self.env,
+        )
+        deadline = time.time() + self.timeout
+        ready = 0
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {self.proc.returncode}")
+            try:
+                with urlopen(f"http://127.0.0.1:{self.port}/ready", timeout=2) as r:
+                    ready += r.status == 200
+            except (URLError, HTTPError, OSError):
+                ready = 0
+            # Connections land on any worker: a few ready answers in a row before measuring
+            if ready >= 2 * self.workers:
+                return self
+            time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"uvicorn did not become ready within {self.timeout}s")
+
+    def __exit__(self, *exc):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        return False
+
+# ==========================================================
+# CLIENT
+# ==========================================================
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 GET client on asyncio streams (no third-party client needed)."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: application/json\r\n\r\n".encode("ascii"))
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif status in (204, 304):
+            body = b""
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+async def drive(port, queries, concurrency, duration, warmup):
+    """`concurrency` closed-loop clients for warmup + duration seconds; only the last `duration` is measured."""
+    next_query = itertools.cycle(queries).__next__
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    latencies, statuses, failures = [], {}, {}
+
+    async def client():
+        conn = HttpConnection("127.0.0.1", port)
+        try:
+            while True:
+                sent = time.perf_counter()
+                if sent >= stop_at:
+                    return
+                try:
+                    status, _ = await conn.get(f"/search?q={quote(next_query())}")
+                except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                    conn.close()
+                    status = None
+                    if sent >= measure_from:
+                        failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+                done = time.perf_counter()
+                if sent >= measure_from and status is not None:
+                    statuses[status] = statuses.get(status, 0) + 1
+                    latencies.append((done - sent) * 1000)
+        finally:
+            conn.close()
+
+    cpu_start = time.process_time()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    client_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - start)
+
+    latencies.sort()
+    total = len(latencies) + sum(failures.values())
+    errors = sum(n for status, n in statuses.items() if status >= 400) + sum(failures.values())
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 2),
+        # Successful responses only: fast 503s from admission control are not throughput
+        "throughput_rps": round((total - errors) / elapsed, 1) if elapsed > 0 else 0,
+        "error_rate": round(errors / total, 4) if total else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "failures": failures,
+        # Over every response, 503s included
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "p999": percentile(latencies, 99.9),
+            "max": latencies[-1] if latencies else None,
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+        },
+        # A saturated load generator measures itself, not the server
+        "client_cpu": round(client_cpu, 2),
+    }
+
+# ==========================================================
+# REPORT
+# ==========================================================
+def fmt_ms(v):
+    return f"{v:.1f}" if v is not None else "-"
+
+def print_report(results):
+    print("\n" + "="*112)
+    print("   /search LOAD TEST")
+    print("="*112)
+    print(f"{'WORKERS':>7} {'THREADS':>7} {'CONC':>5} {'REQS':>8} {'RPS':>8} {'ERR %':>6} {'P50':>8} {'P90':>8} {'P99':>8} {'P99.9':>8} {'MAX':>8} {'CLI CPU':>8}  STATUSES")
+    print("-"*112)
+    for r in results:
+        lat = r["latency_ms"]
+        statuses = " ".join(f"{k}:{v}" for k, v in r["statuses"].items())
+        if r["failures"]:
+            statuses += " " + " ".join(f"{k}:{v}" for k, v in r["failures"].items())
+        print(f"{r['workers']:>7} {r['threads'] or 'def':>7} {r['concurrency']:>5} {r['requests']:>8} {r['throughput_rps']:>8.1f} "
+              f"{(r['error_rate'] or 0) * 100:>6.2f} {fmt_ms(lat['p50']):>8} {fmt_ms(lat['p90']):>8} {fmt_ms(lat['p99']):>8} "
+              f"{fmt_ms(lat['p999']):>8} {fmt_ms(lat['max']):>8} {r['client_cpu']:>8.0%}  {statuses}")
+    print("="*112)
+    print("Latencies in ms. CLI CPU near 100% means the load generator, not the server, is the bottleneck.")
+
+def parse_env(pairs):
+    env = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"❌ --env expects KEY=VALUE, got '{pair}'")
+        env[key] = value
+    return env
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end /search load test across uvicorn worker / thread counts.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=DEFAULT_DB, help="Fixture market.db to serve (read only; artifacts are built in a scratch dir)")
+    source.add_argument("--contracts", type=int, help="Serve a synthetic universe of this many contracts instead")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to test")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="THREADPOOL_SIZE values per worker (0 = anyio default)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32], help="Concurrent keep-alive clients")
+    parser.add_argument("--duration", type=float, default=15, help="Measured seconds per configuration")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds of load before each measurement")
+    parser.add_argument("--queries", help="Replay queries from this history file instead of the synthetic weighted mix")
+    parser.add_argument("--mix-size", type=int, default=5000, help="Queries in the generated mix (cycled)")
+    parser.add_argument("--env", action="append", metavar="KEY=VALUE", help="Extra server env, e.g. SEARCH_MAX_IN_FLIGHT=64 (repeatable)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    extra_env = parse_env(args.env)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="load_test_") as workdir:
+        env = prepare_data(workdir, db_path=args.db, contracts=args.contracts)
+        queries = load_query_file(args.queries, args.mix_size) if args.queries else build_query_mix(env["MARKET_DB_PATH"], args.mix_size)
+        print(f"🎯 {len(queries)} queries, e.g. {', '.join(repr(q) for q in queries[:5])}")
+
+        for workers, threads in itertools.product(args.workers, args.threads):
+            print(f"🚀 Booting uvicorn: {workers} worker(s), THREADPOOL_SIZE={threads or 'default'}...")
+            with Server(env, workers, threads, extra_env) as server:
+                for concurrency in args.concurrency:
+                    r = asyncio.run(drive(server.port, queries, concurrency, args.duration, args.warmup))
+                    r.update({"workers": workers, "threads": threads, "concurrency": concurrency})
+                    results.append(r)
+                    print(f"   concurrency {concurrency:>4}: {r['throughput_rps']:.1f} req/s, p99 {fmt_ms(r['latency_ms']['p99'])} ms, "
+                          f"errors {(r['error_rate'] or 0) * 100:.2f}%")
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"source": args.queries or ("synthetic" if args.contracts else args.db), "contracts": args.contracts,
+                       "env": extra_env, "results": results}, f, indent=2)
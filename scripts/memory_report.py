@@ -0,0 +1,135 @@
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import date
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_universe import build_synthetic_db, _expiries
+
+def synthetic_scenarios(today=None):
+    """SCENARIO_QUERIES, but naming instruments that exist in the synthetic universe."""
+    _, monthlies = _expiries(today or date.today())
+    expiry = monthlies[0]
+    day_month = f"{expiry.day} {expiry.strftime('%b').lower()}"
+    return {
+        "pure": ["nifty", "stk00001", "stk0", "niftx"],
+        "future": ["nifty fut", "stk00002 fut"],
+        "option_type": ["nifty ce", "banknifty pe"],
+        "expiry": [f"nifty {day_month}", f"stk00001 {expiry.strftime('%b').lower()}"],
+        "strike": ["nifty 26k", "sensex 80000"],
+        "strike+type": ["banknifty 50k pe", "stk00003 1400 ce"],
+        "strike_range": ["nifty 24000-25000 ce", "banknifty 50k 51k pe"],
+    }
+
+def collect(scenarios, repeat):
+    """Loads snapshot + search index in this (fresh) process and reports structures + scenario profiles."""
+    from app.database import SessionLocal
+    from app.services.memory import structure_sizes, profile_scenarios, process_rss
+    from app.services.search_index import load_search_index
+
+    rss_before = process_rss()
+    db = SessionLocal()
+    start_time = time.time()
+    try:
+        load_search_index(db)
+    finally:
+        db.close()
+    load_seconds = time.time() - start_time
+
+    report = structure_sizes()
+    report["rss_before_load_bytes"] = rss_before
+    report["load_seconds"] = round(load_seconds, 3)
+    report["scenarios"] = profile_scenarios(scenarios, repeat=repeat)
+    return report
+
+def run_synthetic(contracts, repeat):
+    """Child mode: env already points MARKET_DB_PATH/SNAPSHOT_PATH/SEARCH_INDEX_PATH at a scratch dir."""
+    from app.database import SessionLocal
+    from app.services.search_index import build_artifacts
+
+    total = build_synthetic_db(contracts)
+    db = SessionLocal()
+    try:
+        build_artifacts(db)
+    finally:
+        db.close()
+    report = collect(synthetic_scenarios(), repeat)
+    report["contracts"] = total
+    return report
+
+def spawn(contracts, repeat, workdir):
+    # Fresh interpreter per size: module-level engine/paths, and RSS not polluted by the previous size
+    env = dict(os.environ)
+    env["MARKET_DB_PATH"] = os.path.join(workdir, f"synthetic_{contracts}.db")
+    env["SNAPSHOT_PATH"] = os.path.join(workdir, f"synthetic_{contracts}.snap")
+    env["SEARCH_INDEX_PATH"] = os.path.join(workdir, f"synthetic_{contracts}.bin")
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", str(contracts), "--repeat", str(repeat)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def mb(n):
+    return f"{n / 1024 / 1024:.1f}" if n is not None else "-"
+
+def print_report(reports):
+    print("\n" + "="*100)
+    print("   RESIDENT STRUCTURES (MB)")
+    print("="*100)
+    names = ["index.underlying_symbols", "index.brand_matcher", "index.ranks", "index.chains", "index.keyset"]
+    print(f"{'CONTRACTS':>10} {'SNAP FILE':>10} {'SNAP RSS':>9} " + " ".join(f"{n.split('.')[-1][:11]:>11}" for n in names)
+          + f" {'PRIVATE':>8} {'PROC RSS':>9} {'B/CONTRACT':>11}")
+    print("-"*100)
+    for r in reports:
+        s = r["structures"]
+        snap = s.get("snapshot_mapped", {})
+        contracts = r.get("contracts") or snap.get("rows") or 0
+        per_contract = (r["private_total_bytes"] + (snap.get("file_bytes") or 0)) / contracts if contracts else 0
+        print(f"{contracts:>10} {mb(snap.get('file_bytes')):>10} {mb(snap.get('resident_bytes')):>9} "
+              + " ".join(f"{mb(s.get(n, {}).get('bytes')):>11}" for n in names)
+              + f" {mb(r['private_total_bytes']):>8} {mb(r['process_rss_bytes']):>9} {per_contract:>11.0f}")
+
+    print("\n" + "="*100)
+    print("   PER-REQUEST ALLOCATIONS (tracemalloc, KB)")
+    print("="*100)
+    print(f"{'CONTRACTS':>10} {'SCENARIO':<12} {'AVG PEAK':>10} {'MAX PEAK':>10} {'RETAINED':>10} {'BLOCKS':>8} {'ORM OBJS':>9}  WORST QUERY")
+    print("-"*100)
+    for r in reports:
+        contracts = r.get("contracts") or r["structures"].get("snapshot_mapped", {}).get("rows") or 0
+        for scenario, p in r["scenarios"].items():
+            print(f"{contracts:>10} {scenario:<12} {p['avg_peak_bytes'] / 1024:>10.1f} {p['max_peak_bytes'] / 1024:>10.1f} "
+                  f"{p['avg_retained_bytes'] / 1024:>10.1f} {p['avg_retained_blocks']:>8} {p['max_orm_objects']:>9}  {p['worst']['query']}")
+    print("="*100)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory footprint of the search structures and per-request allocations.")
+    parser.add_argument("--contracts", type=int, nargs="+", help="Synthetic universe sizes to measure (default: current market.db)")
+    parser.add_argument("--repeat", type=int, default=3, help="Traced runs per scenario query")
+    parser.add_argument("--json", help="Also write the raw reports to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_synthetic(args.child, args.repeat), default=str))
+        sys.exit(0)
+
+    if args.contracts:
+        reports = []
+        with tempfile.TemporaryDirectory(prefix="memory_report_") as workdir:
+            for contracts in args.contracts:
+                print(f"🏗️  Building + measuring a synthetic universe of {contracts:,} contracts...")
+                reports.append(spawn(contracts, args.repeat, workdir))
+    else:
+        from app.services.memory import SCENARIO_QUERIES
+        reports = [collect(SCENARIO_QUERIES, args.repeat)]
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2, default=str)
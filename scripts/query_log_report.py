@@ -0,0 +1,227 @@
+import sys
+import os
+import json
+import argparse
+from collections import Counter, OrderedDict, defaultdict
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.query_log import QUERY_LOG_DIR, log_files
+from app.services.singleflight import search_key
+
+def read_entries(paths):
+    """(request entries, dropped count) from query log files / directories, oldest first."""
+    entries, dropped = [], 0
+    files = []
+    for path in paths:
+        files.extend(log_files(path) if os.path.isdir(path) else [path])
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("event") == "dropped":
+                    dropped += record.get("count", 0)
+                elif record.get("query") is not None:
+                    entries.append(record)
+    entries.sort(key=lambda e: e.get("ts", 0))
+    return entries, dropped
+
+def normalize(query: str):
+    return " ".join(query.lower().split())
+
+def query_shape(parsed):
+    """Template of a parsed query, e.g. "SYMBOL DAY MON STRIKE CE" or "* DAY MON CE" (global)."""
+    if not parsed:
+        return "?"
+    parts = ["SYMBOL" if parsed.get("raw_symbol") else "*"]
+    if parsed.get("expiry_day"):
+        parts.append("DAY")
+    if parsed.get("expiry_month"):
+        parts.append("MON")
+    if parsed.get("strikes"):
+        parts.append("STRIKES")
+    elif parsed.get("strike"):
+        parts.append("STRIKE")
+    if parsed.get("opt_type"):
+        parts.append(parsed["opt_type"])
+    if parsed.get("is_future"):
+        parts.append("FUT")
+    return " ".join(parts)
+
+def is_no_match(entry):
+    return entry.get("http_status", 200) == 200 and (entry.get("status") == "no_match" or not entry.get("results"))
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+def frequency(entries, top):
+    counts = Counter(normalize(e["query"]) for e in entries)
+    total = len(entries)
+    ranked = counts.most_common()
+    covered = lambda n: round(sum(c for _, c in ranked[:n]) / total, 4) if total else None
+    return {
+        "unique_queries": len(counts),
+        "top_share": {str(n): covered(n) for n in (10, 100, 1000)},
+        "top": [{"query": q, "count": c, "share": round(c / total, 4)} for q, c in ranked[:top]],
+    }
+
+def no_match(entries, top):
+    served = [e for e in entries if e.get("http_status", 200) == 200]
+    misses = [e for e in served if is_no_match(e)]
+    by_scenario = defaultdict(lambda: [0, 0])
+    for e in served:
+        by_scenario[e.get("scenario", "?")][0] += 1
+        by_scenario[e.get("scenario", "?")][1] += is_no_match(e)
+    return {
+        "rate": round(len(misses) / len(served), 4) if served else None,
+        "by_scenario": {s: round(misses / n, 4) for s, (n, misses) in sorted(by_scenario.items())},
+        "top": [{"query": q, "count": c} for q, c in Counter(normalize(e["query"]) for e in misses).most_common(top)],
+    }
+
+def shapes(entries, top):
+    """Latency per query shape, slowest p95 first, with the mean of every search_logic stage."""
+    groups = defaultdict(list)
+    for e in entries:
+        # Coalesced waiters did not run the search, so they say nothing about its cost
+        if e.get("http_status", 200) == 200 and not e.get("coalesced") and "total_ms" in e:
+            groups[query_shape(e.get("parsed"))].append(e)
+    total = sum(len(g) for g in groups.values())
+    report = []
+    for shape, group in groups.items():
+        latencies = sorted(e["total_ms"] for e in group)
+        stage_sums = Counter()
+        for e in group:
+            stage_sums.update(e.get("stages") or {})
+        slowest = max(group, key=lambda e: e["total_ms"])
+        report.append({
+            "shape": shape,
+            "count": len(group),
+            "share": round(len(group) / total, 4),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1],
+            "sql_ms": round(sum(e.get("sql_ms", 0) for e in group) / len(group), 3),
+            "stages_ms": {s: round(v / len(group), 3) for s, v in stage_sums.most_common()},
+            "no_match_rate": round(sum(is_no_match(e) for e in group) / len(group), 4),
+            "slowest": slowest["query"],
+        })
+    report.sort(key=lambda r: r["p95_ms"], reverse=True)
+    return report[:top]
+
+def cache_potential(entries, sizes, ttl):
+    """
+    Hit rate a /search response cache keyed like request coalescing (parsed query, cursor, page size)
+    would have had over this traffic: unbounded, and as an LRU of each size. ttl > 0 expires entries.
+    """
+    cacheable = [e for e in entries if e.get("http_status", 200) == 200 and not e.get("degraded") and e.get("parsed") is not None]
+    results = {}
+    for size in [None] + sorted(sizes):
+        cache = OrderedDict()
+        hits, saved_ms = 0, 0.0
+        for e in cacheable:
+            key = search_key(e["parsed"], e.get("cursor"), e.get("page_size", 10))
+            stored = cache.get(key)
+            if stored is not None and (not ttl or e["ts"] - stored <= ttl):
+                hits += 1
+                saved_ms += e.get("total_ms", 0)
+                cache.move_to_end(key)
+                continue
+            cache[key] = e.get("ts", 0)
+            cache.move_to_end(key)
+            if size is not None and len(cache) > size:
+                cache.popitem(last=False)
+        results["unbounded" if size is None else str(size)] = {
+            "hit_rate": round(hits / len(cacheable), 4) if cacheable else None,
+            "saved_ms": round(saved_ms, 1),
+        }
+    return {
+        "cacheable": len(cacheable),
+        "distinct_keys": len({search_key(e["parsed"], e.get("cursor"), e.get("page_size", 10)) for e in cacheable}),
+        "already_coalesced": sum(1 for e in entries if e.get("coalesced")),
+        "ttl_seconds": ttl,
+        "lru": results,
+    }
+
+def analyze(entries, dropped, top=20, cache_sizes=(100, 1000, 10000), ttl=0):
+    statuses = Counter(str(e.get("http_status", "?")) for e in entries)
+    timestamps = [e["ts"] for e in entries if "ts" in e]
+    return {
+        "requests": len(entries),
+        "dropped": dropped,
+        "span_seconds": round(timestamps[-1] - timestamps[0], 1) if timestamps else 0,
+        "http_statuses": dict(statuses.most_common()),
+        "scenarios": dict(Counter(e.get("scenario", "?") for e in entries).most_common()),
+        "next_pages": sum(1 for e in entries if e.get("cursor")),
+        "degraded": sum(1 for e in entries if e.get("degraded")),
+        "frequency": frequency(entries, top),
+        "no_match": no_match(entries, top),
+        "slowest_shapes": shapes(entries, top),
+        "cache": cache_potential(entries, cache_sizes, ttl),
+    }
+
+def fmt_ms(v):
+    return f"{v:.1f}" if v is not None else "-"
+
+def print_report(report):
+    print("\n" + "="*100)
+    print("   /search QUERY LOG REPORT")
+    print("="*100)
+    print(f"Requests: {report['requests']} over {report['span_seconds']}s | dropped by the writer: {report['dropped']} | "
+          f"next pages: {report['next_pages']} | degraded: {report['degraded']}")
+    print(f"HTTP: {report['http_statuses']} | scenarios: {report['scenarios']}")
+
+    freq = report["frequency"]
+    print(f"\n🔁 QUERY FREQUENCY ({freq['unique_queries']} unique; top 10/100/1000 cover "
+          f"{' / '.join(f'{v:.0%}' if v is not None else '-' for v in freq['top_share'].values())} of traffic)")
+    for row in freq["top"]:
+        print(f"   {row['count']:>8}  {row['share']:>6.1%}  {row['query']}")
+
+    nm = report["no_match"]
+    rate = f"{nm['rate']:.1%}" if nm["rate"] is not None else "-"
+    print(f"\n🕳  NO-MATCH RATE: {rate}  ({', '.join(f'{s}: {r:.1%}' for s, r in nm['by_scenario'].items())})")
+    for row in nm["top"]:
+        print(f"   {row['count']:>8}  {row['query']}")
+
+    print("\n🐢 SLOWEST QUERY SHAPES (coalesced waiters excluded; ms)")
+    print(f"   {'SHAPE':<28} {'COUNT':>8} {'SHARE':>6} {'P50':>8} {'P95':>8} {'P99':>8} {'MAX':>8} {'SQL':>7}  STAGES (mean)")
+    for row in report["slowest_shapes"]:
+        stages = " ".join(f"{s}={v:.2f}" for s, v in row["stages_ms"].items())
+        print(f"   {row['shape']:<28} {row['count']:>8} {row['share']:>6.1%} {fmt_ms(row['p50_ms']):>8} {fmt_ms(row['p95_ms']):>8} "
+              f"{fmt_ms(row['p99_ms']):>8} {fmt_ms(row['max_ms']):>8} {row['sql_ms']:>7.2f}  {stages}")
+        print(f"   {'':<28} slowest: {row['slowest']!r}")
+
+    cache = report["cache"]
+    ttl = f", TTL {cache['ttl_seconds']}s" if cache["ttl_seconds"] else ""
+    print(f"\n💾 CACHE-HIT POTENTIAL ({cache['cacheable']} cacheable responses, {cache['distinct_keys']} distinct keys{ttl}; "
+          f"{cache['already_coalesced']} already shared by coalescing)")
+    for size, row in cache["lru"].items():
+        hit_rate = f"{row['hit_rate']:.1%}" if row["hit_rate"] is not None else "-"
+        print(f"   {size:>10} entries: hit rate {hit_rate:>6}, {row['saved_ms'] / 1000:.1f}s of search time saved")
+    print("="*100)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline analysis of the /search query log (frequency, no-match rate, slow shapes, cache potential).")
+    parser.add_argument("paths", nargs="*", default=[QUERY_LOG_DIR], help="Query log directories or files (default: QUERY_LOG_DIR)")
+    parser.add_argument("--top", type=int, default=20, help="Rows per ranking")
+    parser.add_argument("--cache-sizes", type=int, nargs="+", default=[100, 1000, 10000], help="LRU sizes to simulate")
+    parser.add_argument("--ttl", type=float, default=0, help="Simulated cache TTL in seconds (0 = until evicted)")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    entries, dropped = read_entries(args.paths)
+    if not entries:
+        raise SystemExit(f"❌ No query log entries in {', '.join(args.paths)}")
+    report = analyze(entries, dropped, args.top, args.cache_sizes, args.ttl)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Wrote {args.json}")
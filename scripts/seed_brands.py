@@ -1,3 +1,81 @@
 import sys
 import os
 
+import csv
+import time
+from sqlalchemy import insert
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal, BrandTag, create_tables
+
+BATCH_SIZE = 5000
+
+def read_aliases(csv_file):
+    """Rows of tag,symbol,tag_type,weight (header required). Blank weight -> 50."""
+    with open(csv_file, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            tag = (row.get('tag') or '').strip()
+            symbol = (row.get('symbol') or '').strip().upper()
+            if not tag or not symbol:
+                continue
+            weight = (row.get('weight') or '').strip()
+            yield {
+                "tag": tag,
+                "symbol": symbol,
+                "tag_type": (row.get('tag_type') or 'Brand').strip(),
+                "weight": int(weight) if weight else 50
+            }
+
+def seed_brands(csv_file):
+    db = SessionLocal()
+
+    # 1. ENSURE TABLE EXISTS
+    create_tables()
+
+    # 2. CLEAR EXISTING ALIASES
+    print("🗑️  Clearing all data from 'brand_tags' table...")
+    try:
+        rows_deleted = db.query(BrandTag).delete()
+        db.commit()
+        print(f"✅ Wiped {rows_deleted} old aliases.")
+    except Exception as e:
+        print(f"❌ Error deleting rows: {e}")
+        db.rollback()
+        db.close()
+        return
+
+    # 3. STREAM CSV INTO SQLITE IN BATCHES
+    # Core insert() with a list of dicts is an executemany, which keeps tens of thousands of aliases to a few seconds.
+    print(f"📂 Reading {csv_file}...")
+    if not os.path.exists(csv_file):
+        print(f"❌ Error: {csv_file} not found.")
+        db.close()
+        return
+
+    start_time = time.time()
+    total = 0
+    batch = []
+    try:
+        for alias in read_aliases(csv_file):
+            batch.append(alias)
+            if len(batch) >= BATCH_SIZE:
+                db.execute(insert(BrandTag), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(BrandTag), batch)
+            total += len(batch)
+        db.commit()
+        end_time = time.time()
+        print(f"✅ Success! Inserted {total} aliases in {end_time - start_time:.2f} seconds.")
+    except Exception as e:
+        print(f"❌ Error inserting aliases: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    default_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "brand_tags.csv")
+    seed_brands(sys.argv[1] if len(sys.argv) > 1 else default_file)
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import SessionLocal, Instrument, create_tables
+from app.services.search_index import build_artifacts, ARTIFACT_PATH
 
 def seed_database():
     db = SessionLocal()
@@ -74,6 +75,16 @@ def seed_database():
     except Exception as e:
         print(f"❌ Error inserting data: {e}")
         db.rollback()
+        db.close()
+        return
+
+    # 5. REBUILD THE SHARED SNAPSHOT + SEARCH INDEX ARTIFACT
+    # Workers map the snapshot and load the artifact at boot only: restart them to serve the new data version.
+    try:
+        build_artifacts(db)
+        print(f"📦 Rebuilt instrument snapshot and search index at {ARTIFACT_PATH}")
+    except Exception as e:
+        print(f"❌ Error building search artifacts: {e}")
     finally:
         db.close()
 
@@ -0,0 +1,128 @@
+import sys
+import os
+import time
+import random
+from datetime import date, timedelta
+from sqlalchemy import insert
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH_SIZE = 5000
+
+# (symbol, spot, strike step, strike scale); SENSEX strikes are stored x100 like the real feed
+INDICES = [("NIFTY", 25000, 50, 1), ("BANKNIFTY", 50000, 100, 1), ("FINNIFTY", 23000, 50, 1), ("SENSEX", 76000, 100, 100)]
+INDEX_STRIKES_PER_SIDE = 60
+STOCK_STRIKES_PER_SIDE = 20
+
+def _expiries(today):
+    """Four weeklies + four monthlies (last Tuesday of the month), nearest first."""
+    weeklies = [today + timedelta(days=7 * i + (1 - today.weekday()) % 7) for i in range(4)]
+    monthlies = []
+    year, month = today.year, today.month
+    while len(monthlies) < 4:
+        last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        expiry = last - timedelta(days=(last.weekday() - 1) % 7)
+        if expiry >= today:
+            monthlies.append(expiry)
+        year, month = year + month // 12, month % 12 + 1
+    return weeklies, monthlies
+
+def generate_rows(contracts, today=None, seed=7):
+    """
+    Instrument rows shaped like the processed feed: indices with weekly + monthly chains, then
+    NSE/BSE equity twins with monthly futures/options, added until there are `contracts` rows.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    weeklies, monthlies = _expiries(today)
+    next_id = [1000]
+
+    def new_id():
+        next_id[0] += 1
+        return next_id[0]
+
+    def label(d):
+        return d.strftime("%d-%b-%y"), f"{d.day} {d.strftime('%b').upper()}", d.strftime("%y%b").upper()
+
+    def row(iid, itype, symbol, display, exchange=None, segment=2, underlying=None, expiry=None, expiry_type=None, option_type=None, strike=None):
+        return {
+            "InstrumentId": iid, "InstrumentType": itype, "Symbol": symbol, "DisplaySymbol": display,
+            "Exchange": exchange, "Segment": segment, "TradingSymbol": symbol, "Isin": None,
+            "UnderlyingInstrumentId": underlying, "ExpiryDate": expiry, "ExpiryType": expiry_type,
+            "OptionType": option_type, "StrikePrice": strike,
+        }
+
+    def chain(uid, symbol, itype, expiry, spot, step, per_side, scale, expiry_type):
+        expiry_str, expiry_disp, expiry_code = label(expiry)
+        for k in range(spot - per_side * step, spot + per_side * step + 1, step):
+            for option_type, tag in ((3, "CE"), (4, "PE")):
+                yield row(new_id(), itype, f"{symbol}{expiry_code}{k}{tag}", f"{symbol} {expiry_disp} {k} {tag}",
+                          underlying=uid, expiry=expiry_str, expiry_type=expiry_type, option_type=option_type, strike=float(k * scale))
+
+    def universe():
+        for symbol, spot, step, scale in INDICES:
+            uid = new_id()
+            yield row(uid, 2, symbol, symbol, exchange=1, segment=1)
+            for expiry in monthlies:
+                expiry_str, expiry_disp, expiry_code = label(expiry)
+                yield row(new_id(), 6, f"{symbol}{expiry_code}FUT", f"{symbol} {expiry_disp} FUT", underlying=uid, expiry=expiry_str, expiry_type=1)
+            for expiry in sorted(set(weeklies + monthlies)):
+                yield from chain(uid, symbol, 5, expiry, spot, step, INDEX_STRIKES_PER_SIDE, scale, 2)
+
+        n = 0
+        while True:
+            symbol = f"STK{n:05d}"
+            n += 1
+            spot = rng.choice([150, 800, 1400, 2500, 3000])
+            step = max(spot // 100, 1)
+            twins = []
+            for exchange in (1, 2):
+                twins.append(new_id())
+                yield row(twins[-1], 1, symbol, symbol, exchange=exchange, segment=1)
+            for expiry in monthlies:
+                expiry_str, expiry_disp, expiry_code = label(expiry)
+                yield row(new_id(), 4, f"{symbol}{expiry_code}FUT", f"{symbol} {expiry_disp} FUT", underlying=twins[1], expiry=expiry_str, expiry_type=1)
+                yield from chain(twins[1], symbol, 3, expiry, spot, step, STOCK_STRIKES_PER_SIDE, 1, 1)
+
+    for i, r in enumerate(universe()):
+        if i >= contracts:
+            return
+        yield r
+
+def build_synthetic_db(contracts, today=None):
+    """Recreates the instruments table at MARKET_DB_PATH with a synthetic universe of `contracts` rows."""
+    if not os.environ.get("MARKET_DB_PATH"):
+        # Never wipe the real data/market.db
+        raise RuntimeError("Set MARKET_DB_PATH to the synthetic database path before importing app")
+    from app.database import SessionLocal, Instrument, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    total = 0
+    try:
+        db.query(Instrument).delete()
+        batch = []
+        for r in generate_rows(contracts, today):
+            batch.append(r)
+            if len(batch) >= BATCH_SIZE:
+                db.execute(insert(Instrument), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(Instrument), batch)
+            total += len(batch)
+        db.commit()
+    finally:
+        db.close()
+    return total
+
+if __name__ == "__main__":
+    # python scripts/synthetic_universe.py 200000 /tmp/synthetic.db
+    contracts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "synthetic_market.db")
+    os.environ["MARKET_DB_PATH"] = os.path.abspath(sys.argv[2] if len(sys.argv) > 2 else default_path)
+    from app.database import DB_PATH
+    start_time = time.time()
+    total = build_synthetic_db(contracts)
+    print(f"✅ Wrote {total} synthetic instruments to {DB_PATH} in {time.time() - start_time:.2f} seconds.")
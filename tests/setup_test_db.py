@@ -24,7 +24,8 @@ def setup_db():
             test_id TEXT PRIMARY KEY,
             description TEXT,
             user_input TEXT,
-            expected_output_json TEXT
+            expected_output_json TEXT,
+            check_type TEXT DEFAULT 'results'
         )
     """)
 
@@ -219,10 +220,94 @@ def setup_db():
         )
     ]
 
-    cursor.executemany("INSERT INTO master_test_cases VALUES (?, ?, ?, ?)", test_cases)
+    # 4. REGRESSION CASES (check_type: what test_runner.py compares, see run_check there)
+    regression_cases = [
+        # --- STRIKE RANGES & LISTS ---
+        (
+            "TC_022",
+            "Strike Range (24000-25000)",
+            "nifty 24000-25000",
+            # Inclusive range -> Spot + strikes from 24000 up, nearest expiry first
+            json.dumps(["NIFTY", "NIFTY 30 DEC 24000 CE", "NIFTY 30 DEC 24000 PE", "NIFTY 30 DEC 24050 CE", "NIFTY 30 DEC 24050 PE"]),
+            "results"
+        ),
+        (
+            "TC_023",
+            "Strike Range Shared K (24-25k)",
+            "nifty 24-25k",
+            # '24-25k' -> the 'k' applies to both ends: same as 24000-25000
+            json.dumps(["NIFTY", "NIFTY 30 DEC 24000 CE", "NIFTY 30 DEC 24000 PE", "NIFTY 30 DEC 24050 CE", "NIFTY 30 DEC 24050 PE"]),
+            "results"
+        ),
+        (
+            "TC_024",
+            "Strike Range Words (24k to 25k)",
+            "nifty 24k to 25k",
+            # 'to' range -> same as 24000-25000
+            json.dumps(["NIFTY", "NIFTY 30 DEC 24000 CE", "NIFTY 30 DEC 24000 PE", "NIFTY 30 DEC 24050 CE", "NIFTY 30 DEC 24050 PE"]),
+            "results"
+        ),
+        (
+            "TC_025",
+            "Strike List (50k 51k)",
+            "banknifty 50k 51k",
+            # Two strikes -> only 50000 and 51000, nearest expiry first
+            json.dumps(["BANKNIFTY", "BANKNIFTY 30 DEC 50000 CE", "BANKNIFTY 30 DEC 50000 PE", "BANKNIFTY 30 DEC 51000 CE", "BANKNIFTY 30 DEC 51000 PE"]),
+            "results"
+        ),
+
+        # --- BRAND ALIAS: WORD BOUNDARIES ---
+        (
+            "TC_026",
+            "Brand Alias (Maggi)",
+            "maggi",
+            # Alias 'MAGGI' -> NESTLEIND spot + futures
+            json.dumps(["NESTLEIND", "NESTLEIND 30 DEC FUT", "NESTLEIND 27 JAN FUT", "NESTLEIND 24 FEB FUT"]),
+            "results"
+        ),
+        (
+            "TC_027",
+            "Alias Inside a Word (XMaggi)",
+            "xmaggi",
+            # 'MAGGI' is not on a word boundary -> no alias hit, no match
+            json.dumps(["no_match"]),
+            "status"
+        ),
+
+        # --- CURSOR CODEC ---
+        (
+            "TC_028",
+            "Next Page via Cursor",
+            "nifty ce",
+            # next_cursor of page 1 decodes back to the position after it
+            json.dumps(["NIFTY 30 DEC 22500 CE", "NIFTY 30 DEC 22550 CE", "NIFTY 30 DEC 22600 CE", "NIFTY 30 DEC 22650 CE"]),
+            "next_page"
+        ),
+        (
+            "TC_029",
+            "Malformed Cursor",
+            "nifty ce",
+            # A cursor that does not decode is a client error, not a 500
+            json.dumps(["400"]),
+            "bad_cursor"
+        ),
+
+        # --- CONDITIONAL REQUESTS ---
+        (
+            "TC_030",
+            "ETag Revalidation (304)",
+            "nifty",
+            # Sending the response's ETag back as If-None-Match -> empty 304
+            json.dumps(["200", "304"]),
+            "etag"
+        ),
+    ]
+
+    cursor.executemany("INSERT INTO master_test_cases (test_id, description, user_input, expected_output_json) VALUES (?, ?, ?, ?)", test_cases)
+    cursor.executemany("INSERT INTO master_test_cases VALUES (?, ?, ?, ?, ?)", regression_cases)
     conn.commit()
     conn.close()
-    print(f"Database populated with {len(test_cases)} user-provided test cases.")
+    print(f"Database populated with {len(test_cases)} user-provided test cases and {len(regression_cases)} regression cases.")
 
 if __name__ == "__main__":
     setup_db()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import sqlite3
+import json
+import random
+import argparse
+import sys
+import os
+
+# Add parent directory to path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal, Instrument
+from app.services.search_index import load_search_index
+from app.services.warmup import load_hot_queries
+from app.services.query_log import QUERY_LOG_DIR
+from app.services.shadow import load_engine, timed, match_names, ShadowReport
+
+TEST_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "test_suite.db")
+
+# {s} = underlying symbol; strikes in both scales exercise the x100 rule, day/month the expiry tie-breaks
+GENERATED_TEMPLATES = [
+    "{s}", "{s} fut", "{s} ce", "{s} pe", "{s} jan", "{s} feb ce", "{s} 27", "{s} 27 jan", "{s} 27 jan fut",
+    "{s} 26k", "{s} 50k pe", "{s} 25000 ce", "{s} 24500", "{s} 1500 ce", "{s} 2500 pe", "{s} 85000",
+    "{s} 3.5k", "{s}s ce", "{s} call", "{s} put",
+    "{s} 24000-25000 ce", "{s} 1400-1500", "{s} 50k 51k pe", "{s} 24-25k",
+]
+
+def load_master_cases(path=TEST_DB):
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT user_input FROM master_test_cases")]
+    finally:
+        conn.close()
+
+def generate_queries(db, count, seed=7):
+    """Symbols with derivatives (plus a few without), crossed with every query shape search_logic handles."""
+    symbols = sorted(s for (s,) in db.query(Instrument.Symbol).filter(Instrument.InstrumentType.in_([1, 2])).distinct())
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        symbol = rng.choice(symbols).lower()
+        # Typos and truncations go through fuzzy / prefix resolution
+        roll = rng.random()
+        if roll < 0.1 and len(symbol) > 4:
+            symbol = symbol[:-1] + rng.choice("aeiou")
+        elif roll < 0.2 and len(symbol) > 4:
+            symbol = symbol[:3]
+        queries.append(rng.choice(GENERATED_TEMPLATES).format(s=symbol))
+    return queries
+
+def build_corpus(db, generated, history_path, history_top):
+    # Real traffic only: no warmup defaults, and nothing replayed when there is no history yet
+    replayed = load_hot_queries(history_path, history_top, fallback=False) if history_path else []
+    if not replayed:
+        print(f"⚠️  No query history in {history_path or '(QUERY_LOG_DIR off)'}; the replayed bucket is empty")
+    corpus, seen = [], set()
+    for source, queries in (
+        ("master", load_master_cases()),
+        ("generated", generate_queries(db, generated)),
+        ("replayed", replayed),
+    ):
+        for q in queries:
+            if q and q.strip().lower() not in seen:
+                seen.add(q.strip().lower())
+                corpus.append((source, q))
+    return corpus
+
+def run_shadow(reference_spec, candidate_spec, generated, history_path, history_top, repeat, show):
+    reference, candidate = load_engine(reference_spec), load_engine(candidate_spec)
+    db = SessionLocal()
+    load_search_index(db)
+
+    corpus = build_corpus(db, generated, history_path, history_top)
+    report = ShadowReport(keep=max(show, 1))
+    sources = {"master": [0, 0], "generated": [0, 0], "replayed": [0, 0]}
+
+    print(f"\nShadow run: reference={reference_spec} candidate={candidate_spec} ({len(corpus)} queries)")
+    for source, query in corpus:
+        # Best of `repeat` runs per engine: first calls pay cold-cache costs the other engine would not
+        ref_result, ref_ms = timed(reference, query, db)
+        cand_result, cand_ms = timed(candidate, query, db)
+        for _ in range(repeat - 1):
+            ref_ms = min(ref_ms, timed(reference, query, db)[1])
+            cand_ms = min(cand_ms, timed(candidate, query, db)[1])
+
+        score, _ = report.record(query, match_names(ref_result), match_names(cand_result), ref_ms, cand_ms)
+        counts = sources.setdefault(source, [0, 0])
+        counts[0] += 1
+        counts[1] += score < 100
+    db.close()
+
+    summary = report.as_dict()
+    print("-" * 96)
+    print(f"{'CATEGORY':<14} {'QUERIES':>8} {'DIVERGED':>9} {'AVG SCORE':>10} {'REF ms':>10} {'CAND ms':>10} {'SPEEDUP':>9}")
+    print("-" * 96)
+    for name, stats in list(summary["categories"].items()) + [("TOTAL", summary["total"])]:
+        speedup = f"{stats['speedup']}x" if stats["speedup"] is not None else "-"
+        print(f"{name:<14} {stats['runs']:>8} {stats['divergences']:>9} {stats['avg_score']:>10} "
+              f"{stats['reference_avg_ms']:>10} {stats['candidate_avg_ms']:>10} {speedup:>9}")
+    print("-" * 96)
+    print("By source: " + ", ".join(f"{s}={n} ({d} diverged)" for s, (n, d) in sources.items()))
+
+    for d in summary["recent_divergences"][:show]:
+        print(f"\nDIVERGED: '{d['query']}' ({d['category']}, score {d['score']}): {d['mistakes']}")
+        print(f"{'REFERENCE':<40} | {'CANDIDATE':<40}")
+        print("-" * 83)
+        for i in range(max(len(d["reference"]), len(d["candidate"]))):
+            r = d["reference"][i] if i < len(d["reference"]) else ""
+            c = d["candidate"][i] if i < len(d["candidate"]) else ""
+            marker = " " if r == c else "*"
+            print(f"{r:<40} | {c:<40} {marker}")
+
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differential run of a candidate search engine against a reference engine.")
+    parser.add_argument("--reference", default="sql", help="Engine treated as correct (registry name or module:function); default: the original SQL path")
+    parser.add_argument("--candidate", default="search_logic", help="Engine under test (registry name or module:function)")
+    parser.add_argument("--generated", type=int, default=300, help="Number of generated queries")
+    parser.add_argument("--history", default=QUERY_LOG_DIR, help="Query history to replay (query log directory, JSONL or one query per line); default: QUERY_LOG_DIR")
+    parser.add_argument("--history-top", type=int, default=200, help="Most frequent history queries to replay")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query per engine (best is kept)")
+    parser.add_argument("--show", type=int, default=10, help="Divergences to print side by side")
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    summary = run_shadow(args.reference, args.candidate, args.generated, args.history, args.history_top, args.repeat, args.show)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(1 if summary["total"]["divergences"] else 0)
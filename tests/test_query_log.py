@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+# Add parent directory to path so we can import from app
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from app.services.query_log import QueryLog, LOG_FILE, log_files
+
+# One worker lifetime: start the writer, log enough to rotate, exit with a partly written current file
+WORKER = """
+import sys, time
+from app.services.query_log import QueryLog
+log = QueryLog(sys.argv[1], max_bytes=2000, keep=3)
+log.start()
+for i in range(100):
+    log.log({"ts": i, "query": f"q{i}", "pad": "x" * 40})
+    time.sleep(0.001)
+log.log({"ts": 100, "query": "last"})
+log.stop()
+"""
+
+class QueryLogRestartTest(unittest.TestCase):
+    """Workers that exit leave queries-<pid>.jsonl behind; the next writer must fold them into pruning."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="query_logs_")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def run_worker(self):
+        subprocess.run([sys.executable, "-c", WORKER, self.directory], cwd=ROOT_DIR, check=True)
+
+    def test_file_count_stays_bounded_across_restarts(self):
+        pids = set()
+        for _ in range(6):
+            self.run_worker()
+            pids.update(LOG_FILE.match(os.path.basename(p)).group(1) for p in log_files(self.directory))
+            # Every restart ran under a new pid; rolled files (3) + the last worker's current file
+            self.assertLessEqual(len(log_files(self.directory)), 3 + 1)
+        self.assertGreater(len(pids), 1)
+
+        # Only the last worker may still have a current file; earlier ones were rolled by their successor
+        current = [p for p in log_files(self.directory) if not LOG_FILE.match(os.path.basename(p)).group(2)]
+        self.assertLessEqual(len(current), 1)
+
+    def test_live_worker_file_is_left_alone(self):
+        # The test runner's parent is alive, so its file belongs to a running worker
+        live = os.path.join(self.directory, f"queries-{os.getppid()}.jsonl")
+        with open(live, "w") as f:
+            f.write(json.dumps({"ts": 1, "query": "nifty"}) + "\n")
+        log = QueryLog(self.directory, keep=3)
+        log.start()
+        log.stop()
+        self.assertTrue(os.path.exists(live))
+
+if __name__ == "__main__":
+    unittest.main()
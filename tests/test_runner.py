@@ -1,14 +1,17 @@
 import sqlite3
 import json
+import asyncio
 import logging
 import sys
 import os
+from urllib.parse import urlencode
 
 # Add parent directory to path so we can import from app
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from app.services.search_service import search_logic
+    from app.services.shadow import calculate_score_and_errors
     from app.database import SessionLocal
 except ImportError:
     print("ERROR: Could not import 'search_service' or 'database'.")
@@ -19,37 +22,50 @@ TEST_DB = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "test
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("TestRunner")
 
-def calculate_score_and_errors(expected, actual):
-    score = 100
-    errors = []
-
-    exp_set = set(expected)
-    act_set = set(actual)
-
-    missing = exp_set - act_set
-    extra = act_set - exp_set
-
-    if missing:
-        count = len(missing)
-        score -= (count * 10)
-        errors.append(f"Missing {count} items: {', '.join(missing)}")
-    
-    if extra:
-        count = len(extra)
-        score -= (count * 10)
-        errors.append(f"Extra {count} items: {', '.join(extra)}")
-
-    if score > 0:
-        seq_errors = []
-        for i in range(len(expected)):
-            if i < len(actual) and expected[i] != actual[i]:
-                score -= 5
-                seq_errors.append(f"Pos {i}: Expected '{expected[i]}' != Got '{actual[i]}'")
-        
-        if seq_errors:
-            errors.append("Sequence Errors: " + "; ".join(seq_errors))
-
-    return max(0, score), " | ".join(errors) if errors else "None"
+def asgi_get(path, params, headers=None):
+    """(status, headers) of one GET served by the app in-process: no server, no HTTP client dependency."""
+    from app.main import app
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": urlencode(params).encode(),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}
+
+def display_names(api_response):
+    if api_response.get('status') == 'success':
+        return [x['display_name'] for x in api_response['matches']]
+    return []
+
+def run_check(check_type, user_input, market_db):
+    """The list a case's expected_output_json is compared against, per check_type."""
+    if check_type == "status":
+        return [search_logic(user_input, market_db).get("status")]
+    if check_type == "next_page":
+        # Cursor codec round trip: page 1's next_cursor must decode to the position after it
+        first = search_logic(user_input, market_db)
+        if not first.get("next_cursor"):
+            return []
+        return display_names(search_logic(user_input, market_db, cursor=first["next_cursor"]))
+    if check_type == "bad_cursor":
+        status, _ = asgi_get("/search", {"q": user_input, "cursor": "not-a-cursor"})
+        return [str(status)]
+    if check_type == "etag":
+        status, headers = asgi_get("/search", {"q": user_input})
+        revalidated, _ = asgi_get("/search", {"q": user_input}, {"If-None-Match": headers.get("etag", "")})
+        return [str(status), str(revalidated)]
+    return display_names(search_logic(user_input, market_db))
 
 def run_tests():
     if not os.path.exists(TEST_DB):
@@ -64,7 +80,7 @@ def run_tests():
     run_id = test_cursor.lastrowid
     logger.info(f"--- Starting Test Run #{run_id} ---")
 
-    test_cursor.execute("SELECT test_id, user_input, expected_output_json FROM master_test_cases")
+    test_cursor.execute("SELECT test_id, user_input, expected_output_json, check_type FROM master_test_cases")
     cases = test_cursor.fetchall()
 
     run_total_score = 0
@@ -75,15 +91,11 @@ def run_tests():
     print(f"{'ID':<8} {'INPUT':<15} {'SCORE':<8} {'STATUS':<8} {'MISTAKES'}")
     print("-" * 80)
 
-    for test_id, user_input, expected_json in cases:
+    for test_id, user_input, expected_json, check_type in cases:
         expected_output = json.loads(expected_json)
         
         try:
-            api_response = search_logic(user_input, market_db)
-            if api_response.get('status') == 'success':
-                full_actual = [x['display_name'] for x in api_response['matches']]
-            else:
-                full_actual = []
+            full_actual = run_check(check_type or "results", user_input, market_db)
         except Exception as e:
             logger.error(f"Crash in {test_id}: {e}")
             full_actual = []